@@ -0,0 +1,235 @@
+#!/usr/bin/python -tt
+'''
+Non-interactive play for shell pipelines and other services. Positions are read from stdin and
+the computer's move for each one is written to stdout, in the same order.
+
+A position is the board written out row by row with one character per square, X, O or . (or -)
+for an empty square, so a 3x3 board is 9 characters. X moves first, so the computer plays X when
+both have the same number of marks and O otherwise. A board doesn't record the order its marks
+were played in, which the computer's choices depend on, so the marks are replayed in board order
+alternating between X and O. The computer's random choices are seeded from the seed option, so a
+position always gets the same move.
+
+In text mode each position is a line and each move is written as a line "x y", or "-" if the game
+is already over or the computer declares it a draw. In binary mode each position is a 2 byte
+little-endian length followed by the board, and each move is the 2 bytes x,y or 255,255 for none.
+
+A position that is not a valid board, or can't be reached by playing, gets the line "!" in text
+mode or the 2 bytes 254,254 in binary mode and the positions after it are still played, so one
+bad position doesn't stop the stream. Only a binary record cut short at the end of the input
+stops it, after the moves of every complete record have been written.
+
+Input is read and parsed in large chunks, which are handed out to a pool of worker processes if
+more than one is asked for. A 3x3 board only has a few thousand positions, so their moves are
+cached in each process.
+'''
+import random
+import struct
+import sys
+import tables
+from collections import deque
+from multiprocessing import Pool, cpu_count
+from optparse import OptionParser
+from tictactoe import Game, SparseGame
+
+# Bytes of input read at a time
+CHUNK_BYTES = 1 << 20
+
+# Moves are cached for boards up to this size
+CACHE_MAX_SIZE = 3
+
+LENGTH = '<H'
+NO_MOVE = 255
+INVALID = 254
+
+EMPTY = '.'
+MARKS = { 'X':'X', 'O':'O', '.':EMPTY, '-':EMPTY }
+
+def parse_position(board):
+    '''
+    Parses a board into its size and the coordinate keys of the X and O marks. Raises a
+    ValueError if it is not a square board of at least 3x3 that can be reached by playing.
+    '''
+    size = int(len(board) ** 0.5 + 0.5)
+    if size < 3 or size * size != len(board):
+        raise ValueError("'%s' is not a board of 3x3 or more" % board)
+
+    xs,os = [],[]
+    for key,mark in enumerate(board):
+        mark = MARKS.get(mark)
+        if mark is None:
+            raise ValueError("'%s' has a square that is not X, O or ." % board)
+        elif mark == 'X':
+            xs.append(key)
+        elif mark == 'O':
+            os.append(key)
+    if len(xs) - len(os) not in [0,1]:
+        raise ValueError("'%s' can't be reached with X moving first" % board)
+    return size,xs,os
+
+def is_won(size,xs,os):
+    '''Whether either player has completed a row, column or diagonal'''
+    lines = tables.get(size).lines
+    for marks in [set(xs),set(os)]:
+        for line in range(2 * size + 2):
+            if len([ key for key in lines[line * size:(line + 1) * size] if key in marks ]) == size:
+                return True
+    return False
+
+def best_move(board,seed=0):
+    '''The computer's move (x,y) for the side to move in a position, or None if there is none'''
+    size,xs,os = parse_position(board)
+    return play_position(size,xs,os,seed)
+
+def play_position(size,xs,os,seed=0):
+    '''The computer's move (x,y) in a position parsed by parse_position(), or None if there is none'''
+    if len(xs) + len(os) == size * size or is_won(size,xs,os):
+        return None
+
+    game = (SparseGame if size >= SparseGame.MIN_SIZE else Game)(size,rng=random.Random(seed))
+    if len(xs) > len(os):
+        game.computer.marker = 'O'
+        game.player.marker = 'X'
+
+    moves = []
+    for i in range(len(xs) + len(os)):
+        moves.append( divmod((xs if i % 2 == 0 else os)[i / 2],size) )
+    game.replay(moves)
+
+    game.computer.move(game,game.player)
+    if game.squares_played == len(moves):
+        return None
+    square = game.computer.occupations[-1]
+    return (square.x,square.y)
+
+def format_text(move):
+    return '%s %s\n' % move if move is not None else '-\n'
+
+def format_binary(move):
+    if move is None:
+        return chr(NO_MOVE) + chr(NO_MOVE)
+    if max(move) >= INVALID:
+        raise ValueError('Moves on boards of %sx%s or more cannot be written in binary' % (INVALID + 1,INVALID + 1))
+    return chr(move[0]) + chr(move[1])
+
+def format_invalid(binary):
+    '''The output for a position that could not be played'''
+    return chr(INVALID) + chr(INVALID) if binary else '!\n'
+
+_caches = {}
+
+def play_chunk(task):
+    '''
+    Finds the moves for a chunk of boards and returns them formatted for output, with the
+    invalid position marker for boards that can't be parsed or whose moves can't be written.
+    Errors raised while playing a valid position are bugs and are not caught.
+    '''
+    boards,binary,seed = task
+    cache = _caches.setdefault((binary,seed),{})
+    format = format_binary if binary else format_text
+    cached_length = CACHE_MAX_SIZE * CACHE_MAX_SIZE
+
+    output = []
+    for board in boards:
+        move = cache.get(board)
+        if move is None:
+            try:
+                size,xs,os = parse_position(board)
+                if binary and size > INVALID:
+                    # format_binary() can't write the moves of a board this big
+                    raise ValueError
+            except ValueError:
+                move = format_invalid(binary)
+            else:
+                move = format( play_position(size,xs,os,seed) )
+            if len(board) <= cached_length:
+                cache[board] = move
+        output.append(move)
+    return ''.join(output)
+
+def text_chunks(stream,chunk_bytes=CHUNK_BYTES):
+    '''Reads the non-blank lines of stream a chunk at a time'''
+    tail = ''
+    while True:
+        data = stream.read(chunk_bytes)
+        if not data:
+            break
+        lines = (tail + data).split('\n')
+        tail = lines.pop()
+        boards = [ line.strip() for line in lines ]
+        boards = [ board for board in boards if board ]
+        if boards:
+            yield boards
+    if tail.strip():
+        yield [tail.strip()]
+
+def binary_chunks(stream,chunk_bytes=CHUNK_BYTES):
+    '''Reads the length-prefixed records of stream a chunk at a time'''
+    header = struct.calcsize(LENGTH)
+    data = ''
+    while True:
+        more = stream.read(chunk_bytes)
+        if not more:
+            break
+        data += more
+
+        records = []
+        offset = 0
+        while offset + header <= len(data):
+            length, = struct.unpack_from(LENGTH,data,offset)
+            if offset + header + length > len(data):
+                break
+            records.append( data[offset + header:offset + header + length] )
+            offset += header + length
+        data = data[offset:]
+        if records:
+            yield records
+    if data:
+        raise ValueError('The input ends with a truncated record')
+
+def run(input,output,binary=False,processes=1,seed=0,chunk_bytes=CHUNK_BYTES):
+    '''
+    Writes the computer's move for each position read from input to output. With more than one
+    process, up to a few chunks per process are in flight at a time and their moves are written
+    as soon as all the chunks before them are done.
+    '''
+    chunks = (binary_chunks if binary else text_chunks)(input,chunk_bytes)
+    if processes == 1:
+        for boards in chunks:
+            output.write( play_chunk((boards,binary,seed)) )
+        output.flush()
+        return
+
+    pool = Pool(processes)
+    try:
+        pending = deque()
+        window = 4 * (processes or cpu_count())
+        for boards in chunks:
+            pending.append( pool.apply_async(play_chunk,[(boards,binary,seed)]) )
+            if len(pending) >= window:
+                output.write( pending.popleft().get() )
+        while pending:
+            output.write( pending.popleft().get() )
+        output.flush()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] < POSITIONS > MOVES')
+    parser.add_option('-b', '--binary', action='store_true', default=False,
+                      help='read length-prefixed positions and write 2 byte moves')
+    parser.add_option('-p', '--processes', type='int', default=1,
+                      help='number of worker processes, 0 for one per CPU (default: 1)')
+    parser.add_option('-r', '--seed', type='int', default=0,
+                      help="seed for the computer's random choices (default: 0)")
+    options,args = parser.parse_args()
+    if args:
+        parser.error('positions are read from stdin')
+
+    try:
+        run(sys.stdin,sys.stdout,options.binary,options.processes or None,options.seed)
+    except ValueError, e:
+        sys.stderr.write('%s: %s\n' % (parser.get_prog_name(),e))
+        sys.exit(1)
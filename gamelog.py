@@ -0,0 +1,237 @@
+#!/usr/bin/python -tt
+'''
+Recording of the moves played in games. A MoveRecorder attached to a game keeps each move, the
+Player.MOVE_* branch that chose it and the time since the previous move in a ring buffer of
+arrays, so recording a move is a few array stores. The arrays start small and double as moves
+are recorded until they reach the buffer's capacity, as a game on a large board only plays a
+small part of it. When the game is completed it is handed to a GameLog, which appends finished
+games to a compact binary log file.
+
+The log buffers games in memory and writes them in batches, once enough are waiting or the sync
+interval has passed, fsyncing the file at most once per sync interval, and rotates the file once
+it reaches its maximum size. A log is a header followed by one record per game, each of which is
+a header followed by the board keys, the marker and branch codes and the time deltas of the
+moves as arrays. The arrays are written in the byte order of the machine, which is noted in the
+file header.
+'''
+import os
+import struct
+import sys
+import time
+from array import array
+from optparse import OptionParser
+from timeit import default_timer
+from tictactoe import Game, Player
+
+VERSION = 1
+MAGIC = 'TTTL'
+FILE_HEADER = '<4sBBxx'
+
+# Game record header: start time, board size, computer marker, state, winner, number of moves
+GAME_HEADER = '<dHBBBxI'
+
+MARKERS = { None:0, 'X':1, 'O':2 }
+MARKER_NAMES = dict([ (code,marker) for marker,code in MARKERS.items() ])
+
+# Each move's code holds the marker above the branch
+BRANCH_BITS = 4
+BRANCH_MASK = (1 << BRANCH_BITS) - 1
+MARKER_CODES = dict([ (marker,code << BRANCH_BITS) for marker,code in MARKERS.items() if marker ])
+
+BRANCH_NAMES = dict([ (getattr(Player,name),name[len('MOVE_'):].lower())
+                      for name in dir(Player) if name.startswith('MOVE_') ])
+
+MAX_DELTA = 0xFFFFFFFF
+
+# Moves a recorder has room for before its arrays first grow
+INITIAL_MOVES = 64
+
+class MoveRecorder(object):
+    '''
+    The moves of one game, kept in a ring buffer of capacity moves. A game can't have more
+    moves than squares, but a smaller capacity can be used to only keep the most recent moves.
+    If a log is given, the game is appended to it when it is completed.
+    '''
+    def __init__(self, capacity, log=None):
+        self.capacity = capacity
+        length = min(capacity,INITIAL_MOVES)
+        self.keys = array('I',[0]) * length
+        self.codes = array('B',[0]) * length
+        self.deltas = array('I',[0]) * length
+        self.count = 0
+        self.log = log
+        self.logged = False
+        self.started = time.time()
+        self.last = default_timer()
+
+    def record(self, key, marker, branch):
+        now = default_timer()
+        if self.count == len(self.keys) < self.capacity:
+            self.grow()
+        i = self.count % self.capacity
+        self.keys[i] = key
+        self.codes[i] = MARKER_CODES[marker] | branch
+        self.deltas[i] = min(int((now - self.last) * 1e6),MAX_DELTA)
+        self.last = now
+        self.count += 1
+
+    def grow(self):
+        '''Doubles the length of the arrays, up to the capacity'''
+        more = min(len(self.keys),self.capacity - len(self.keys))
+        for moves in (self.keys,self.codes,self.deltas):
+            moves.extend( array(moves.typecode,[0]) * more )
+
+    def arrays(self):
+        '''The keys, codes and deltas of the moves kept, oldest first'''
+        if self.count <= self.capacity:
+            return (self.keys[:self.count],self.codes[:self.count],self.deltas[:self.count])
+        start = self.count % self.capacity
+        return [ moves[start:] + moves[:start] for moves in (self.keys,self.codes,self.deltas) ]
+
+    def complete(self, game):
+        if self.log is not None and not self.logged and game.state != Game.STATE_IN_PROGRESS:
+            self.log.append(game,self)
+            self.logged = True
+
+def record(game, log=None):
+    '''Starts recording the moves of a game, appending it to log when it is completed'''
+    game.recorder = MoveRecorder(game.size * game.size,log)
+    return game.recorder
+
+def encode(game, recorder):
+    '''The log record of a game'''
+    keys,codes,deltas = recorder.arrays()
+    header = struct.pack(GAME_HEADER,recorder.started,game.size,MARKERS[game.computer.marker],
+                         game.state,MARKERS[game.winner],len(keys))
+    return header + keys.tostring() + codes.tostring() + deltas.tostring()
+
+
+class GameLog(object):
+    '''
+    Appends finished games to the log file at path. Games are buffered until at least
+    buffer_bytes are waiting or sync_interval seconds have passed since the last fsync, and the
+    file is fsynced when they are written if the sync interval has passed. The interval is only
+    checked when a game is appended, so the last games are written by flush() or close().
+    Before the file would grow past max_bytes it is renamed to path.1 (path.1 to path.2 and so
+    on, keeping up to backups old files) and a new file is started.
+    '''
+    def __init__(self, path, max_bytes=64 << 20, backups=5, buffer_bytes=64 << 10, sync_interval=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer_bytes = buffer_bytes
+        self.sync_interval = sync_interval
+        self.pending = []
+        self.pending_bytes = 0
+        self.last_sync = default_timer()
+        self.file = self.__open()
+
+    def __open(self):
+        f = open(self.path,'ab')
+        f.seek(0,os.SEEK_END)
+        if f.tell() == 0:
+            f.write( struct.pack(FILE_HEADER,MAGIC,VERSION,sys.byteorder == 'little') )
+            f.flush()
+        return f
+
+    def append(self, game, recorder):
+        record = encode(game,recorder)
+        self.pending.append(record)
+        self.pending_bytes += len(record)
+        if ( self.pending_bytes >= self.buffer_bytes or
+             default_timer() - self.last_sync >= self.sync_interval ):
+            self.flush()
+
+    def flush(self):
+        '''Writes the buffered games, fsyncing the file if the sync interval has passed'''
+        if self.pending:
+            size = self.file.tell()
+            if size > struct.calcsize(FILE_HEADER) and size + self.pending_bytes > self.max_bytes:
+                self.rotate()
+            self.file.write( ''.join(self.pending) )
+            self.file.flush()
+            self.pending = []
+            self.pending_bytes = 0
+
+            if default_timer() - self.last_sync >= self.sync_interval:
+                self.sync()
+
+    def sync(self):
+        self.flush()
+        os.fsync(self.file.fileno())
+        self.last_sync = default_timer()
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1,0,-1):
+            if os.path.exists('%s.%s' % (self.path,i)):
+                os.rename('%s.%s' % (self.path,i),'%s.%s' % (self.path,i + 1))
+        if self.backups > 0:
+            os.rename(self.path,'%s.1' % self.path)
+        else:
+            os.remove(self.path)
+        self.file = self.__open()
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+def read(path):
+    '''
+    Yields (started,size,computer,state,winner,moves) for each game in a log, where moves is a
+    list of (marker,x,y,branch,delta) and delta is the microseconds since the previous move. A
+    record cut short by a crash at the end of the log is ignored.
+    '''
+    f = open(path,'rb')
+    try:
+        data = f.read()
+    finally:
+        f.close()
+
+    magic,version,little = struct.unpack_from(FILE_HEADER,data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("'%s' is not a version %s game log" % (path,VERSION))
+    swap = little != (sys.byteorder == 'little')
+
+    offset = struct.calcsize(FILE_HEADER)
+    header = struct.calcsize(GAME_HEADER)
+    while offset + header <= len(data):
+        started,size,computer,state,winner,count = struct.unpack_from(GAME_HEADER,data,offset)
+        offset += header
+        keys,codes,deltas = array('I'),array('B'),array('I')
+        end = offset + count * (keys.itemsize + codes.itemsize + deltas.itemsize)
+        if end > len(data):
+            break
+        for moves in (keys,codes,deltas):
+            moves.fromstring( data[offset:offset + count * moves.itemsize] )
+            if swap:
+                moves.byteswap()
+            offset += count * moves.itemsize
+
+        moves = [ (MARKER_NAMES[code >> BRANCH_BITS],key / size,key % size,code & BRANCH_MASK,delta)
+                  for key,code,delta in zip(keys,codes,deltas) ]
+        yield (started,size,MARKER_NAMES[computer],state,MARKER_NAMES[winner],moves)
+
+def format_game(game):
+    started,size,computer,state,winner,moves = game
+    outcome = { Game.STATE_IN_PROGRESS:'in progress', Game.STATE_DRAW:'draw',
+                Game.STATE_COMPLETE:'%s won' % winner }[state]
+    return '%s %sx%s computer %s, %s: %s' % (
+        time.strftime('%Y-%m-%d %H:%M:%S',time.localtime(started)),size,size,computer,outcome,
+        ' '.join([ '%s(%s,%s) %s +%sus' % (marker,x,y,BRANCH_NAMES.get(branch,branch),delta)
+                   for marker,x,y,branch,delta in moves ]))
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog LOG [LOG ...]\n\nPrints the games recorded in game logs')
+    options,args = parser.parse_args()
+    if not args:
+        parser.error('at least one game log is required')
+
+    for path in args:
+        try:
+            for game in read(path):
+                print format_game(game)
+        except (IOError,ValueError,struct.error), e:
+            sys.stderr.write('%s: %s\n' % (path,e))
+            sys.exit(1)
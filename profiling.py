@@ -0,0 +1,269 @@
+#!/usr/bin/python -tt
+'''
+Profiles the engine by playing games between the computer and random moves on a board of a given
+size. The deterministic profiler traces every function call with sys.setprofile(), which counts
+calls exactly but slows the engine down. The sampling profiler instead records the stack every
+time the process has used another interval of CPU time (ITIMER_PROF), which barely slows it down
+but only estimates where the time goes.
+
+The board is printed after every move, as in the interactive game, but the output is discarded.
+The report lists the functions taking the most time, both including and excluding the functions
+they call, followed by the engine's key functions. Stacks can also be written in the collapsed
+format read by flame graph tools, one line per stack with its frames separated by semicolons and
+followed by its self time in microseconds or its number of samples.
+
+This module is named profiling rather than profile so that it doesn't hide the standard library's
+profile module.
+'''
+import inspect
+import os
+import random
+import signal
+import sys
+from optparse import OptionParser
+from timeit import default_timer
+from tictactoe import Game, SparseGame
+
+DETERMINISTIC = 'deterministic'
+SAMPLING = 'sampling'
+
+# The engine functions always shown in the report, when they were called. Intersections are
+# weighed by Path.intersection() for each pair of paths, or by Game.__crossing_weights() for all
+# of them at once when NumPy is installed and there are enough pairs, see Game.path_weights()
+FOCUS = ['Player.strategize','SparsePlayer.strategize','Player.destrategize','Player.sort_paths',
+         'Game.best_intersection','Game.path_weights','Path.intersection','Game.__crossing_weights',
+         'Game.__permute_and_choose_point','SparseGame.__random_point','Game.available_square',
+         'Game.available_corner','Game.available_center','Game.print_board','SparseGame.print_board']
+
+def qualified_name(frame):
+    '''
+    The name of the function running in frame, as Class.method for methods found on the class
+    of self (or a base class) and module.function otherwise
+    '''
+    code = frame.f_code
+    owner = frame.f_locals.get('self') if code.co_argcount and code.co_varnames[0] == 'self' else None
+    if owner is not None:
+        for cls in inspect.getmro(owner.__class__):
+            # Private methods are stored under their mangled name
+            mangled = '_%s%s' % (cls.__name__.lstrip('_'),code.co_name)
+            for attribute in [cls.__dict__.get(code.co_name),cls.__dict__.get(mangled)]:
+                function = getattr(attribute,'fget',attribute)
+                if getattr(function,'func_code',None) is code:
+                    return '%s.%s' % (cls.__name__,code.co_name)
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return '%s.%s' % (module,code.co_name)
+
+def builtin_name(function):
+    '''The name of a built-in function, as type.method for methods of built-in types'''
+    owner = getattr(function,'__self__',None)
+    if owner is not None and not inspect.ismodule(owner):
+        return '%s.%s' % (type(owner).__name__,function.__name__)
+    return function.__name__
+
+def play(size,games,seed=0,boards=True):
+    '''
+    Plays games between the computer and random moves, alternating who moves first, printing
+    the board after each move if boards is set
+    '''
+    rng = random.Random(seed)
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull,'w')
+    try:
+        for i in range(games):
+            game = (SparseGame if size >= SparseGame.MIN_SIZE else Game)(size,rng=rng)
+            game.play(i % 2 == 0)
+            while game.state == Game.STATE_IN_PROGRESS:
+                if boards:
+                    game.print_board()
+                x,y = game.available_square()
+                game.player.move(game,game.computer,x,y)
+            if boards:
+                game.print_board()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+class Profile:
+    '''
+    The time spent in each function, by name, both in total (including the functions it calls)
+    and by itself, along with the time spent by itself in each stack of functions. Calls are
+    only counted by the deterministic profiler.
+    '''
+    def __init__(self,mode,interval=None):
+        self.mode = mode
+        self.interval = interval
+        self.calls = {}
+        self.total = {}
+        self.own = {}
+        self.stacks = {}
+
+    def elapsed(self):
+        return sum(self.own.values())
+
+    def collapsed(self):
+        '''Lines of stacks in the collapsed format, with time in microseconds or sample counts'''
+        lines = []
+        for stack,value in sorted(self.stacks.items()):
+            value = int(round(value * 1e6)) if self.mode == DETERMINISTIC else value
+            if value > 0:
+                lines.append('%s %s' % (';'.join(stack),value))
+        return lines
+
+    def report(self,out=sys.stdout,limit=25):
+        elapsed = self.elapsed() or 1.0
+        unit = 1.0 if self.mode == DETERMINISTIC else self.interval
+
+        def row(name):
+            calls = self.calls.get(name)
+            return '%10s %10.4f %6.1f%% %10.4f %6.1f%%  %s\n' % (
+                calls if calls is not None else '-',self.total[name] * unit,100.0 * self.total[name] / elapsed,
+                self.own.get(name,0) * unit,100.0 * self.own.get(name,0) / elapsed,name)
+        header = '%10s %10s %7s %10s %7s  %s\n' % ('calls','total s','','self s','','function')
+
+        out.write('%s profile, %.3f s\n\n' % (self.mode.capitalize(),self.elapsed() * unit))
+        out.write(header)
+        for name in sorted(self.total,key=lambda name: (-self.total[name],name))[:limit]:
+            out.write( row(name) )
+
+        out.write('\nEngine functions\n\n')
+        out.write(header)
+        for name in FOCUS:
+            if name in self.total:
+                out.write( row(name) )
+
+
+class Tracer:
+    '''A sys.setprofile() function that times every Python and built-in function call'''
+    def __init__(self,profile):
+        self.profile = profile
+        self.names = {}
+        self.stack = []
+        self.depths = {}
+
+    def __call__(self,frame,event,arg):
+        now = default_timer()
+        if event == 'call':
+            code = frame.f_code
+            name = self.names.get(code)
+            if name is None:
+                name = self.names[code] = qualified_name(frame)
+            self.enter(name,now)
+        elif event == 'c_call':
+            self.enter(builtin_name(arg),now)
+        elif self.stack:
+            self.leave(now)
+
+    def enter(self,name,now):
+        path = (self.stack[-1][3] if self.stack else ()) + (name,)
+        self.stack.append( [name,now,0.0,path] )
+        self.depths[name] = self.depths.get(name,0) + 1
+
+    def leave(self,now):
+        name,start,children,path = self.stack.pop()
+        elapsed = now - start
+        profile = self.profile
+        profile.calls[name] = profile.calls.get(name,0) + 1
+        profile.own[name] = profile.own.get(name,0.0) + elapsed - children
+        profile.stacks[path] = profile.stacks.get(path,0.0) + elapsed - children
+
+        # Only the outermost call of a recursive function counts towards its total
+        self.depths[name] -= 1
+        if not self.depths[name]:
+            profile.total[name] = profile.total.get(name,0.0) + elapsed
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+
+class Sampler:
+    '''A SIGPROF handler that counts the stacks, up to the root function, it interrupts'''
+    def __init__(self,profile,root):
+        self.profile = profile
+        self.root = root.func_code
+        self.names = {}
+
+    def __call__(self,signum,frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            name = self.names.get(code)
+            if name is None:
+                name = self.names[code] = qualified_name(frame)
+            stack.append(name)
+            if code is self.root:
+                break
+            frame = frame.f_back
+        else:
+            # Not interrupted while playing
+            return
+        stack.reverse()
+        stack = tuple(stack)
+        self.profile.stacks[stack] = self.profile.stacks.get(stack,0) + 1
+
+    def finish(self):
+        '''Works out the sample counts of each function from the stacks'''
+        profile = self.profile
+        for stack,count in profile.stacks.items():
+            profile.own[stack[-1]] = profile.own.get(stack[-1],0) + count
+            for name in set(stack):
+                profile.total[name] = profile.total.get(name,0) + count
+
+def run(size,games,mode=DETERMINISTIC,interval=0.001,seed=0,boards=True):
+    '''Plays games on a board of the given size under a profiler and returns the Profile'''
+    profile = Profile(mode,interval)
+    if mode == DETERMINISTIC:
+        sys.setprofile( Tracer(profile) )
+        try:
+            play(size,games,seed,boards)
+        finally:
+            sys.setprofile(None)
+    else:
+        sampler = Sampler(profile,play)
+        handler = signal.signal(signal.SIGPROF,sampler)
+        signal.setitimer(signal.ITIMER_PROF,interval,interval)
+        try:
+            play(size,games,seed,boards)
+        finally:
+            signal.setitimer(signal.ITIMER_PROF,0)
+            signal.signal(signal.SIGPROF,handler)
+        sampler.finish()
+    return profile
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] SIZE')
+    parser.add_option('-n', '--games', type='int', default=100,
+                      help='number of games to play (default: 100)')
+    parser.add_option('-m', '--mode', type='choice', choices=[DETERMINISTIC,SAMPLING], default=DETERMINISTIC,
+                      help='deterministic or sampling profiler (default: deterministic)')
+    parser.add_option('-i', '--interval', type='float', default=1.0,
+                      help='milliseconds of CPU time between samples (default: 1)')
+    parser.add_option('-r', '--seed', type='int', default=0,
+                      help='seed for the random moves (default: 0)')
+    parser.add_option('-l', '--limit', type='int', default=25,
+                      help='number of functions to report (default: 25)')
+    parser.add_option('-o', '--collapsed', default=None,
+                      help='file to write collapsed stacks to, for flame graphs')
+    parser.add_option('--no-board', action='store_false', dest='boards', default=True,
+                      help="don't print the board after each move")
+    options,args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('a board size is required')
+    try:
+        size = int(args[0])
+        if size < 3:
+            raise ValueError
+    except ValueError:
+        parser.error("'%s' is not a valid board size" % args[0])
+
+    profile = run(size,options.games,options.mode,options.interval / 1000.0,options.seed,options.boards)
+    print 'Played %s games on a %sx%s board' % (options.games,size,size)
+    profile.report(limit=options.limit)
+
+    if options.collapsed:
+        f = open(options.collapsed,'w')
+        try:
+            f.write( '\n'.join(profile.collapsed()) + '\n' )
+        finally:
+            f.close()
+        print '\nCollapsed stacks written to %s' % options.collapsed
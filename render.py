@@ -0,0 +1,145 @@
+#!/usr/bin/python -tt
+'''
+Board rendering for large boards. Game.print_board() builds the whole grid as one string every
+time it is called, which gets slow for boards of 50x50 and up. A BoardRenderer draws the board
+once and then only rewrites the squares that were played since the last draw, using ANSI
+escape sequences to position the cursor. A board too big for the terminal is drawn as a view of
+the rows and columns that fit, which follows the last move. write_board() streams a complete
+board row by row, which is suitable for logs as the board is never held in memory as one string.
+'''
+import struct
+import sys
+
+CLEAR_SCREEN = '\x1b[H\x1b[2J'
+CLEAR_BELOW = '\x1b[J'
+
+def move_cursor(row,column):
+    '''The escape sequence moving the cursor to a 1-based row and column'''
+    return '\x1b[%s;%sH' % (row,column)
+
+def terminal_size(out):
+    '''Gets the (rows,columns) of the terminal out writes to, or None if it is not a terminal'''
+    try:
+        import fcntl
+        import termios
+        rows,columns = struct.unpack('hh',fcntl.ioctl(out.fileno(),termios.TIOCGWINSZ,'\0' * 4))
+        return (rows,columns)
+    except (ImportError,AttributeError,IOError,ValueError):
+        return None
+
+def label_width(game):
+    return len(str(game.size - 1))
+
+def write_board(game,out,rows=None,columns=None):
+    '''
+    Writes the complete board, or the given ranges of its rows and columns, to out one row at a
+    time. The layout is the same as Game.print_board(), except that row and column labels stay
+    aligned on boards of 10x10 and up.
+    '''
+    rows = rows or range(game.size)
+    columns = columns or range(game.size)
+    width = label_width(game)
+    glue = ' ' * (width + 2) + ('+'.join(['---'] * len(columns))) + '\n'
+
+    out.write('\n' + ' ' * (width + 3) + ''.join([ str(y).ljust(4) for y in columns ]).rstrip() + ' \n')
+    for x in rows:
+        if x > rows[0]:
+            out.write(glue)
+        row = game.board[ game.coordinate_key(x,columns[0]) : game.coordinate_key(x,columns[-1] + 1) ]
+        out.write(' ' + str(x).rjust(width) + '  ' + (' | '.join([ str(cell) for cell in row ])) + ' \n')
+    out.write('\n')
+
+
+class BoardRenderer:
+    '''
+    Draws a game on a terminal, keeping the rendered squares so that later draws only move the
+    cursor to the squares that changed and rewrite them. Only as many rows and columns as fit
+    on the terminal are drawn, leaving PROMPT_LINES lines below the board, and this view of the
+    board scrolls to the last move whenever that is outside it. The board is drawn in full the
+    first time, for a new game or board size, when the view scrolls and whenever the terminal
+    is resized. After each draw the cursor is left on the line below the board with the rest of
+    the screen cleared. Squares are addressed from the top of the screen, so callers report the
+    lines they write below the board with wrote(), and once there are more than PROMPT_LINES of
+    them, which may have scrolled the screen, the next draw redraws the board.
+    '''
+    # Boards at least this big are drawn with a BoardRenderer by the interactive game
+    MIN_SIZE = 10
+
+    # Lines kept free below the board for the interactive game's messages and prompts
+    PROMPT_LINES = 4
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.cells = None
+        self.played = 0
+        self.size = None
+        self.terminal = None
+        self.rows = None
+        self.columns = None
+        self.lines_below = 0
+
+    def wrote(self, lines=1):
+        '''Counts lines written below the board since the last draw'''
+        self.lines_below += lines
+
+    def height(self, game):
+        '''The number of screen lines taken up by the board'''
+        return 2 * len(self.rows) + 2
+
+    def position(self, game, x, y):
+        '''The 1-based screen (row,column) of the square x,y'''
+        return (3 + 2 * (x - self.rows[0]), 4 + label_width(game) + 4 * (y - self.columns[0]))
+
+    def view_size(self, game, terminal):
+        '''The number of rows and columns of the board that fit on a terminal of the given size'''
+        if terminal is None:
+            return (game.size,game.size)
+        rows = (terminal[0] - BoardRenderer.PROMPT_LINES - 2) / 2
+        columns = (terminal[1] - label_width(game) - 4) / 4
+        return (max(min(rows,game.size),1), max(min(columns,game.size),1))
+
+    def in_view(self, x, y):
+        return x in self.rows and y in self.columns
+
+    def draw(self, game):
+        terminal = terminal_size(self.out)
+        moves = game.history()
+        last = moves[-1][1:] if moves else (0,0)
+        if ( self.cells is None or self.size != game.size or terminal != self.terminal or
+             game.squares_played < self.played or not self.in_view(*last) or
+             self.lines_below > BoardRenderer.PROMPT_LINES ):
+            self.redraw(game,terminal,last)
+        else:
+            self.update(game,moves)
+        self.lines_below = 0
+        self.out.flush()
+
+    def redraw(self, game, terminal, last=(0,0)):
+        '''Draws the whole view, centered on the last move as far as the edges of the board allow'''
+        height,width = self.view_size(game,terminal)
+        top = min(max(last[0] - height / 2,0),game.size - height)
+        left = min(max(last[1] - width / 2,0),game.size - width)
+        self.rows = range(top,top + height)
+        self.columns = range(left,left + width)
+
+        self.out.write(CLEAR_SCREEN)
+        write_board(game,self.out,self.rows,self.columns)
+        self.cells = [ str(square) for square in game.board ]
+        self.played = game.squares_played
+        self.size = game.size
+        self.terminal = terminal
+
+    def update(self, game, moves):
+        '''Rewrites the squares in view played since the last draw'''
+        changes = []
+        for marker,x,y in moves[self.played:]:
+            key = game.coordinate_key(x,y)
+            cell = str(game.square(x,y))
+            if self.cells[key] != cell:
+                self.cells[key] = cell
+                if self.in_view(x,y):
+                    changes.append( move_cursor(*self.position(game,x,y)) + cell )
+        self.played = game.squares_played
+
+        changes.append( move_cursor(self.height(game) + 1,1) + CLEAR_BELOW )
+        self.out.write(''.join(changes))
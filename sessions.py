@@ -0,0 +1,192 @@
+#!/usr/bin/python -tt
+'''
+A two-tier store for games that are waiting on their human player. Recently used games stay
+live in a least recently used cache of bounded size. Once that is full, the least recently
+used game is packed into a fixed-size slot of a memory-mapped file, which only holds the
+board size, the game state and the moves played so far. Freed slots are reused before the
+file is grown.
+
+When a packed game is needed again it is faulted back in by replaying its moves, which
+rebuilds both players' win paths exactly as they were, so nothing but the moves is stored. The
+paths are rebuilt as soon as the game is faulted in rather than on first use: they depend on the
+order of every move, so the only way to rebuild them is to replay the whole game, and a game is
+only faulted in to be moved on, which needs them straight away.
+
+A slot can't hold a game's random state or solution table, so the store only takes games that
+use the shared random module and, if they play from a solver.Solution, the one the store was
+given for their board size. Subclasses of Game, such as SparseGame, are not stored either.
+
+The file starts with a header recording the largest board size its slots were made for and
+their size, so that it is always read back with the slots it was written with.
+'''
+import mmap
+import os
+import random
+import struct
+from collections import OrderedDict
+from tictactoe import Game
+
+VERSION = 1
+MAGIC = 'TTTP'
+
+# File header: magic, version, largest board size, slot size
+FILE_HEADER = '<4sBxHI'
+
+# Slot header: session id, in use, board size, computer marker, state, winner, whether the game
+# plays from a solution, number of moves
+SLOT_HEADER = '<QBBBBBBH'
+MARKERS = { None:0, 'X':1, 'O':2 }
+MARKER_NAMES = dict([ (code,marker) for marker,code in MARKERS.items() ])
+
+def pack(session_id,game):
+    '''Packs a game into a slot record, without padding'''
+    moves = [ game.coordinate_key(x,y) for marker,x,y in game.history() ]
+    header = struct.pack(SLOT_HEADER,session_id,1,game.size,MARKERS[game.computer.marker],
+                         game.state,MARKERS[game.winner],game.solution is not None,len(moves))
+    return header + struct.pack('<%sH' % len(moves),*moves)
+
+def unpack(record,solutions={}):
+    '''
+    Rebuilds the session id and game packed in a slot record. A game that played from a
+    solution gets the one for its size in solutions.
+    '''
+    session_id,used,size,computer,state,winner,solved,count = struct.unpack_from(SLOT_HEADER,record)
+    moves = struct.unpack_from('<%sH' % count,record,struct.calcsize(SLOT_HEADER))
+
+    game = Game(size,solutions[size] if solved else None)
+    game.computer.marker = MARKER_NAMES[computer]
+    game.player.marker = 'O' if game.computer.marker == 'X' else 'X'
+
+    # Replaying the moves rebuilds the occupations and win paths of both players
+    game.replay([ divmod(key,size) for key in moves ])
+    game.complete(state,MARKER_NAMES[winner])
+    return session_id,game
+
+
+class SessionStore:
+    '''
+    Holds games by integer session id. Up to capacity games are kept live, and the rest are
+    packed into slots of the file at path, which must only be used by one store at a time.
+    Slots are sized for boards of up to max_size. An existing file is reopened with the slots
+    it was created with, and the games packed in it are available again. Reopening a file
+    whose slots are too small for max_size raises a ValueError. Games that play from a solution
+    must use the one in solutions, a dictionary of solver.Solution by board size.
+    '''
+    def __init__(self, path, capacity=1024, max_size=9, initial_slots=1024, solutions={}):
+        self.capacity = capacity
+        self.solutions = solutions
+        self.live = OrderedDict()
+        self.slots = {}
+        self.free = []
+        self.header_size = struct.calcsize(FILE_HEADER)
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path,'r+b' if exists else 'w+b')
+        if exists:
+            try:
+                header = self.file.read(self.header_size).ljust(self.header_size,'\0')
+                magic,version,file_max_size,self.slot_size = struct.unpack(FILE_HEADER,header)
+                if magic != MAGIC or version != VERSION:
+                    raise ValueError("'%s' is not a version %s session file" % (path,VERSION))
+                if file_max_size < max_size:
+                    raise ValueError("'%s' holds boards of up to %sx%s" % (path,file_max_size,file_max_size))
+                if ( self.slot_size != struct.calcsize(SLOT_HEADER) + 2 * file_max_size * file_max_size or
+                     (os.path.getsize(path) - self.header_size) % self.slot_size ):
+                    raise ValueError("'%s' is damaged" % path)
+                self.max_size = file_max_size
+            except ValueError:
+                self.file.close()
+                raise
+        else:
+            self.max_size = max_size
+            self.slot_size = struct.calcsize(SLOT_HEADER) + 2 * max_size * max_size
+            self.file.write( struct.pack(FILE_HEADER,MAGIC,VERSION,max_size,self.slot_size) )
+            self.file.truncate(self.header_size + initial_slots * self.slot_size)
+        self.data = mmap.mmap(self.file.fileno(),0)
+        self.slot_count = (len(self.data) - self.header_size) / self.slot_size
+
+        # Rebuild the index from any slots in use
+        for slot in range(self.slot_count - 1,-1,-1):
+            session_id,used = struct.unpack_from('<QB',self.data,self.__offset(slot))
+            if used:
+                self.slots[session_id] = slot
+            else:
+                self.free.append(slot)
+
+    def __offset(self, slot):
+        return self.header_size + slot * self.slot_size
+
+    def __len__(self):
+        return len(self.live) + len(self.slots)
+
+    def __contains__(self, session_id):
+        return session_id in self.live or session_id in self.slots
+
+    def put(self, session_id, game):
+        '''
+        Stores a game as the most recently used, spilling the least recently used one if needed.
+        Raises a ValueError for a game that could not be packed into a slot and rebuilt as it is.
+        '''
+        if game.size > self.max_size:
+            raise ValueError('Boards larger than %sx%s cannot be stored' % (self.max_size,self.max_size))
+        if game.__class__ is not Game:
+            raise ValueError('Only %s games can be stored' % Game.__name__)
+        if game.rng is not random:
+            raise ValueError('Games with their own random number generator cannot be stored')
+        if game.solution is not None and game.solution is not self.solutions.get(game.size):
+            raise ValueError("The game's solution is not the store's solution for %sx%s" % (game.size,game.size))
+        self.discard(session_id)
+        self.live[session_id] = game
+        while len(self.live) > self.capacity:
+            self.__spill( *self.live.popitem(last=False) )
+
+    def get(self, session_id):
+        '''Gets a game, faulting it back in from its slot if it was spilled'''
+        if session_id in self.live:
+            game = self.live.pop(session_id)
+        elif session_id in self.slots:
+            slot = self.slots.pop(session_id)
+            offset = self.__offset(slot)
+            game = unpack(self.data[offset:offset + self.slot_size],self.solutions)[1]
+            self.data[offset + 8] = '\0'
+            self.free.append(slot)
+        else:
+            raise KeyError(session_id)
+
+        self.put(session_id,game)
+        return game
+
+    def discard(self, session_id):
+        '''Removes a game if it is stored'''
+        if self.live.pop(session_id,None) is None and session_id in self.slots:
+            slot = self.slots.pop(session_id)
+            self.data[self.__offset(slot) + 8] = '\0'
+            self.free.append(slot)
+
+    def __spill(self, session_id, game):
+        if not self.free:
+            self.__grow()
+        slot = self.free.pop()
+        offset = self.__offset(slot)
+        record = pack(session_id,game)
+        self.data[offset:offset + len(record)] = record
+        self.slots[session_id] = slot
+
+    def __grow(self):
+        '''Doubles the number of slots in the file'''
+        count = max(self.slot_count * 2,1)
+        self.data.resize(self.__offset(count))
+        self.free.extend( range(count - 1,self.slot_count - 1,-1) )
+        self.slot_count = count
+
+    def flush(self):
+        self.data.flush()
+
+    def close(self):
+        '''Spills every live game and closes the file'''
+        for session_id,game in self.live.items():
+            self.__spill(session_id,game)
+        self.live.clear()
+        self.data.flush()
+        self.data.close()
+        self.file.close()
@@ -0,0 +1,356 @@
+#!/usr/bin/python -tt
+'''
+A retrograde solver for small boards. Every position that can be reached by counting moves
+(X moves first, so X has as many marks as O or one more) is solved one layer of moves at a
+time, starting from the full board and working back to the empty one. A position in one
+layer only depends on positions in the next, so each layer is split between a pool of worker
+processes which all write into one shared table indexed by a perfect hash of the position
+(the board read as a base 3 number).
+
+Each entry records the game value for the side to move along with the number of moves until
+the result with perfect play. Solved tables are saved in a compact file holding one byte per
+position, ordered by layer and then by the lexicographic order of the X and O squares, which
+a Game can memory-map to play perfectly at the cost of a lookup per candidate move.
+'''
+import mmap
+import struct
+import tables
+from bisect import bisect
+from itertools import combinations, islice
+from multiprocessing import Pool
+from multiprocessing.sharedctypes import RawArray
+from optparse import OptionParser
+
+# Game values from the point of view of the side to move
+LOSS = 1
+DRAW = 2
+WIN = 3
+
+MAX_SIZE = 4
+HEADER = '<4sBBHI'
+MAGIC = 'TTTS'
+VERSION = 1
+
+# Number of X combinations handed to a worker at a time
+CHUNK = 64
+
+def binomial(n,k):
+    if k < 0 or k > n:
+        return 0
+    result = 1
+    for i in range(k):
+        result = result * (n - i) / (i + 1)
+    return result
+
+def win_lines(size):
+    '''Bitmasks of the squares in every row, column and diagonal of the board'''
+    squares = tables.get(size).lines
+    return [ sum([ 1 << key for key in squares[line * size:(line + 1) * size] ])
+             for line in range(2 * size + 2) ]
+
+def layer_counts(plies):
+    '''The number of X and O marks on the board after the given number of moves'''
+    return ((plies + 1) / 2, plies / 2)
+
+_offsets = {}
+
+def layer_offsets(size):
+    '''The rank of the first position of each layer in the compact file, plus the total count'''
+    offsets = _offsets.get(size)
+    if offsets is None:
+        squares = size * size
+        offsets = [0]
+        for plies in range(squares + 1):
+            nx,no = layer_counts(plies)
+            offsets.append( offsets[-1] + binomial(squares,nx) * binomial(squares - nx,no) )
+        _offsets[size] = offsets
+    return offsets
+
+def combination_rank(combination,n):
+    '''The lexicographic rank of a sorted combination of range(n)'''
+    k = len(combination)
+    rank = 0
+    previous = -1
+    for i,item in enumerate(combination):
+        for skipped in range(previous + 1,item):
+            rank += binomial(n - skipped - 1,k - i - 1)
+        previous = item
+    return rank
+
+def insertion_ranks(combination,n,binomials):
+    '''
+    The lexicographic ranks of a sorted combination of range(n) with each item not in it added,
+    as a list by item with None for the items already in it. A combination c of k items has the
+    rank C(n,k) - 1 - sum(C(n - 1 - c[i],k - i)), and adding an item only raises k - i for the
+    items before it, so the sum is kept up to date as the added item moves along.
+    '''
+    k = len(combination)
+    before = 0
+    after = sum([ binomials[n - 1 - item][k - i] for i,item in enumerate(combination) ])
+    last = binomials[n][k + 1] - 1
+    ranks = [None] * n
+    i = 0
+    for item in range(n):
+        if i < k and combination[i] == item:
+            before += binomials[n - 1 - item][k + 1 - i]
+            after -= binomials[n - 1 - item][k - i]
+            i += 1
+        else:
+            ranks[item] = last - before - binomials[n - 1 - item][k + 1 - i] - after
+    return ranks
+
+def position_rank(size,xs,os):
+    '''The perfect, minimal hash of a position used as its offset in the compact file'''
+    squares = size * size
+    nx,no = len(xs),len(os)
+    plies = nx + no
+    rest = [ sq for sq in range(squares) if sq not in xs ]
+    relabelled = [ rest.index(sq) for sq in os ]
+    return ( layer_offsets(size)[plies] + combination_rank(xs,squares) * binomial(squares - nx,no) +
+             combination_rank(relabelled,squares - nx) )
+
+def pack(value,distance):
+    return (value << 6) | distance
+
+def unpack(entry):
+    return (entry >> 6, entry & 63)
+
+_table = None
+_ranked = None
+
+def _attach(table,ranked):
+    '''Pool initializer that gives each worker the shared result tables'''
+    global _table, _ranked
+    _table = table
+    _ranked = ranked
+
+def solve_chunk(task):
+    '''
+    Solves the positions of one layer whose X squares are the start-th up to the stop-th
+    combination. Every position in the following layer must already be solved.
+    '''
+    size,plies,start,stop = task
+    squares = size * size
+    lines = win_lines(size)
+    powers = [ 3 ** sq for sq in range(squares) ]
+    nx,no = layer_counts(plies)
+    x_to_move = nx == no
+    mover = 1 if x_to_move else 2
+    table,ranked = _table,_ranked
+
+    per_x = binomial(squares - nx,no)
+    rank = layer_offsets(size)[plies] + start * per_x
+
+    for xs in islice(combinations(range(squares),nx),start,stop):
+        xmask = 0
+        xindex = 0
+        for sq in xs:
+            xmask |= 1 << sq
+            xindex += powers[sq]
+        rest = [ sq for sq in range(squares) if not xmask >> sq & 1 ]
+
+        for os in combinations(rest,no):
+            omask = 0
+            index = xindex
+            for sq in os:
+                omask |= 1 << sq
+                index += 2 * powers[sq]
+
+            # The side that just moved may already have completed a line
+            last = omask if x_to_move else xmask
+            won = False
+            for line in lines:
+                if last & line == line:
+                    won = True
+                    break
+
+            if won:
+                entry = pack(LOSS,0)
+            elif plies == squares:
+                entry = pack(DRAW,0)
+            else:
+                best = None
+                for sq in rest:
+                    if omask >> sq & 1:
+                        continue
+                    # The child's value is from the opponent's point of view
+                    value,distance = unpack(table[index + mover * powers[sq]])
+                    value = WIN + LOSS - value
+                    candidate = (value,-distance if value != LOSS else distance)
+                    if best is None or candidate > best:
+                        best = candidate
+                value,distance = best
+                entry = pack(value,1 + abs(distance))
+
+            table[index] = entry
+            ranked[rank] = entry
+            rank += 1
+
+def solve(size,processes=None):
+    '''
+    Solves every position of a board of the given size. Returns the compact table of
+    position values in rank order.
+    '''
+    if size > MAX_SIZE:
+        raise ValueError('Boards larger than %sx%s cannot be solved' % (MAX_SIZE,MAX_SIZE))
+
+    squares = size * size
+    table = RawArray('B',3 ** squares)
+    ranked = RawArray('B',layer_offsets(size)[-1])
+
+    pool = None
+    if processes == 1:
+        _attach(table,ranked)
+        run = lambda tasks: map(solve_chunk,tasks)
+    else:
+        pool = Pool(processes,_attach,(table,ranked))
+        run = lambda tasks: pool.map(solve_chunk,tasks,chunksize=1)
+
+    try:
+        for plies in range(squares,-1,-1):
+            nx,no = layer_counts(plies)
+            total = binomial(squares,nx)
+            run([ (size,plies,start,min(start + CHUNK,total)) for start in range(0,total,CHUNK) ])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return ranked
+
+def save(size,ranked,path):
+    '''Writes a compact table produced by solve() to a file'''
+    f = open(path,'wb')
+    try:
+        f.write( struct.pack(HEADER,MAGIC,VERSION,size,0,len(ranked)) )
+        f.write( buffer(ranked) )
+    finally:
+        f.close()
+
+def load(path):
+    return Solution(path)
+
+
+class Solution:
+    '''
+    A memory-mapped solution file. The operating system pages the table in as positions are
+    looked up, so opening a solution is cheap and the table is shared between processes.
+    '''
+    def __init__(self,path):
+        '''Opens a solution file, raising a ValueError if it is not a whole solution'''
+        self.file = open(path,'rb')
+        try:
+            self.file.seek(0,2)
+            if self.file.tell() < struct.calcsize(HEADER):
+                raise ValueError("'%s' is not a version %s solution file" % (path,VERSION))
+            self.data = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+            magic,version,size,_,count = struct.unpack_from(HEADER,self.data)
+            if magic != MAGIC or version != VERSION or not 3 <= size <= MAX_SIZE:
+                raise ValueError("'%s' is not a version %s solution file" % (path,VERSION))
+            if count != layer_offsets(size)[-1] or len(self.data) != struct.calcsize(HEADER) + count:
+                raise ValueError("'%s' is truncated" % path)
+        except ValueError:
+            self.file.close()
+            raise
+        self.size = size
+        self.offsets = layer_offsets(size)
+        self.binomials = [ [ binomial(n,k) for k in range(size * size + 2) ] for n in range(size * size + 1) ]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def value(self,xs,os):
+        '''
+        Looks up the (value,distance) of a position given the sorted square keys of the X
+        and O marks. The value is from the point of view of the side to move.
+        '''
+        entry = self.data[ struct.calcsize(HEADER) + position_rank(self.size,xs,os) ]
+        return unpack(ord(entry))
+
+    def child_ranks(self,xs,os):
+        '''
+        The ranks of the positions after the side to move plays each square, as a list by square
+        key with None for the played squares, given the sorted keys of the X and O marks. The
+        ranks of all the children are worked out together in one pass over the board.
+        '''
+        squares = self.size * self.size
+        binomials = self.binomials
+        nx,no = len(xs),len(os)
+        rest = squares - nx
+        offset = self.offsets[nx + no + 1]
+
+        # The Os are ranked by their position among the squares without an X
+        labels = [ o - bisect(xs,o) for o in os ]
+
+        if nx > no:
+            x_rank = binomials[squares][nx] - 1 - sum([ binomials[squares - 1 - x][nx - i] for i,x in enumerate(xs) ])
+            o_ranks = insertion_ranks(labels,rest,binomials)
+            per_x = binomials[rest][no + 1]
+            played = set(xs + os)
+            return [ offset + x_rank * per_x + o_ranks[key - bisect(xs,key)] if key not in played else None
+                     for key in range(squares) ]
+
+        # A new X leaves one square less for the Os, which changes the terms of the Os before it
+        x_ranks = insertion_ranks(xs,squares,binomials)
+        per_x = binomials[rest - 1][no]
+        last = binomials[rest - 1][no] - 1
+        before = 0
+        after = sum([ binomials[rest - 1 - label][no - i] for i,label in enumerate(labels) ])
+        ranks = [None] * squares
+        i = 0
+        for key in range(squares):
+            if i < no and os[i] == key:
+                if labels[i] < rest - 1:
+                    before += binomials[rest - 2 - labels[i]][no - i]
+                after -= binomials[rest - 1 - labels[i]][no - i]
+                i += 1
+            elif x_ranks[key] is not None:
+                ranks[key] = offset + x_ranks[key] * per_x + last - before - after
+        return ranks
+
+    def best_move(self,game):
+        '''
+        Chooses the perfect move (x,y) for the side to move in a game: the quickest win, else
+        a draw, else the slowest loss. Ties go to the first square on the board.
+        '''
+        if game.size != self.size:
+            raise ValueError('This solution is for a %sx%s board' % (self.size,self.size))
+
+        xs = [ key for key,square in enumerate(game.board) if square.placemark == 'X' ]
+        os = [ key for key,square in enumerate(game.board) if square.placemark == 'O' ]
+        header = struct.calcsize(HEADER)
+
+        best = None
+        best_key = None
+        for key,rank in enumerate(self.child_ranks(xs,os)):
+            if rank is None:
+                continue
+            value,distance = unpack(ord(self.data[header + rank]))
+            value = WIN + LOSS - value
+            candidate = (value,-distance if value != LOSS else distance)
+            if best is None or candidate > best:
+                best = candidate
+                best_key = key
+        return divmod(best_key,self.size)
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] SIZE')
+    parser.add_option('-o', '--output', default=None,
+                      help='solution file to write (default: SIZExSIZE.solution)')
+    parser.add_option('-p', '--processes', type='int', default=None,
+                      help='number of worker processes (default: one per CPU)')
+    options,args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('a board size is required')
+
+    size = int(args[0])
+    path = options.output or '%sx%s.solution' % (size,size)
+    try:
+        ranked = solve(size,options.processes)
+    except ValueError, e:
+        parser.error(str(e))
+    save(size,ranked,path)
+
+    value,distance = unpack(ranked[0])
+    print '%sx%s: %s in %s moves, written to %s' % (size,size,{WIN:'win',DRAW:'draw',LOSS:'loss'}[value],distance,path)
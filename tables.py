@@ -0,0 +1,189 @@
+#!/usr/bin/python -tt
+'''
+A registry of precomputed tables for each board size. Tables are built the first time a size
+is needed and saved to a versioned cache directory, so later processes only have to read the
+file into arrays. The cache directory is TICTACTOE_CACHE if it is set, otherwise
+~/.cache/tictactoe.
+
+For a board of size n, squares are identified by their coordinate key (n * x) + y and lines
+are numbered with the n rows first, then the n columns, the diagonal and the inverse diagonal.
+'''
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from optparse import OptionParser
+
+VERSION = 2
+MAGIC = 'TTTT'
+HEADER = '<4sHHBxxxI'
+SECTION = '<16scxxxII'
+
+# Square classes
+CENTER = 0
+EDGE = 1
+CORNER = 2
+
+class Tables:
+    '''
+    The precomputed tables for one board size. Each table is an array:
+        square_classes: the CENTER, EDGE or CORNER class of each square
+        edges: the keys of the non-corner edge squares in board order
+        lines: the keys of the squares of each line, size entries per line
+    '''
+    NAMES = ['square_classes','edges','lines']
+
+    def __init__(self,size,**tables):
+        self.size = size
+        for name in Tables.NAMES:
+            setattr(self,name,tables[name])
+
+def layout(size):
+    '''The (typecode,length) of each table for a board of the given size, by name'''
+    return { 'square_classes':('B',size * size), 'edges':('i',4 * (size - 2)),
+             'lines':('i',(2 * size + 2) * size) }
+
+def build(size):
+    '''Computes the tables for a board of the given size'''
+    n = size
+    last = n - 1
+    key = lambda x,y: n * x + y
+
+    square_classes = array('B')
+    edges = array('i')
+    for x in range(n):
+        for y in range(n):
+            on_edge = [ x in [0,last], y in [0,last] ]
+            if all(on_edge):
+                square_classes.append(CORNER)
+            elif any(on_edge):
+                square_classes.append(EDGE)
+                edges.append(key(x,y))
+            else:
+                square_classes.append(CENTER)
+
+    points = [ [ (i,j) for j in range(n) ] for i in range(n) ]
+    points += [ [ (j,i) for j in range(n) ] for i in range(n) ]
+    points.append( [ (i,i) for i in range(n) ] )
+    points.append( [ (i,last - i) for i in range(n) ] )
+
+    lines = array('i',[ key(x,y) for members in points for x,y in members ])
+
+    return Tables(size,square_classes=square_classes,edges=edges,lines=lines)
+
+def cache_dir():
+    base = os.environ.get('TICTACTOE_CACHE') or os.path.join(os.path.expanduser('~'),'.cache','tictactoe')
+    return os.path.join(base,'v%s' % VERSION)
+
+def cache_path(size):
+    return os.path.join(cache_dir(),'tables-%s.bin' % size)
+
+def save(tables,path):
+    '''
+    Writes tables to a file: a header, a directory of (name,typecode,offset,length) sections and
+    the raw contents of each array. The file is written under a temporary name and renamed so
+    that readers never see a partial file.
+    '''
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    offset = struct.calcsize(HEADER) + len(Tables.NAMES) * struct.calcsize(SECTION)
+    sections = []
+    for name in Tables.NAMES:
+        table = getattr(tables,name)
+        sections.append( struct.pack(SECTION,name,table.typecode,offset,len(table)) )
+        offset += len(table) * table.itemsize
+
+    fd,temp = tempfile.mkstemp(dir=directory)
+    f = os.fdopen(fd,'wb')
+    try:
+        f.write( struct.pack(HEADER,MAGIC,VERSION,tables.size,sys.byteorder == 'little',len(sections)) )
+        f.write( ''.join(sections) )
+        for name in Tables.NAMES:
+            getattr(tables,name).tofile(f)
+    finally:
+        f.close()
+    os.chmod(temp,0644)
+    os.rename(temp,path)
+
+def load(path,size):
+    '''
+    Reads the tables in a file written by save(). Returns None if the file is missing, was
+    written for another version, size or byte order, or its sections are not the tables of
+    that size laid out one after another up to the end of the file.
+    '''
+    try:
+        f = open(path,'rb')
+    except IOError:
+        return None
+
+    try:
+        data = f.read()
+        magic,version,file_size,little,count = struct.unpack_from(HEADER,data)
+        if ( magic != MAGIC or version != VERSION or file_size != size or
+             little != (sys.byteorder == 'little') or count != len(Tables.NAMES) ):
+            return None
+
+        expected = layout(size)
+        tables = {}
+        position = struct.calcsize(HEADER)
+        end = position + count * struct.calcsize(SECTION)
+        for i in range(count):
+            name,typecode,offset,length = struct.unpack_from(SECTION,data,position)
+            position += struct.calcsize(SECTION)
+            name = name.rstrip('\0')
+            if expected.get(name) != (typecode,length) or offset != end:
+                return None
+            table = array(typecode)
+            end += length * table.itemsize
+            if end > len(data):
+                return None
+            table.fromstring( data[offset:end] )
+            tables[name] = table
+        if end != len(data):
+            return None
+        return Tables(size,**tables)
+    except (struct.error,ValueError,KeyError,EnvironmentError):
+        return None
+    finally:
+        f.close()
+
+_registry = {}
+
+def get(size):
+    '''
+    Gets the tables for a board of the given size, loading them from the cache or building
+    and caching them the first time they are needed. Failing to write the cache (e.g. on a
+    read-only file system) is not an error, the tables are just built again next time.
+    '''
+    tables = _registry.get(size)
+    if tables is None:
+        path = cache_path(size)
+        tables = load(path,size)
+        if tables is None:
+            tables = build(size)
+            try:
+                save(tables,path)
+            except EnvironmentError:
+                pass
+        _registry[size] = tables
+    return tables
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] MIN_SIZE [MAX_SIZE]\n\n'
+                                'Builds and caches the tables for each board size from MIN_SIZE to MAX_SIZE')
+    parser.add_option('-d', '--cache-dir', default=None,
+                      help='cache directory to warm up (default: $TICTACTOE_CACHE or ~/.cache/tictactoe)')
+    options,args = parser.parse_args()
+    if len(args) not in [1,2]:
+        parser.error('a range of board sizes is required')
+    if options.cache_dir:
+        os.environ['TICTACTOE_CACHE'] = options.cache_dir
+
+    sizes = range(int(args[0]),int(args[-1]) + 1)
+    for size in sizes:
+        save(build(size),cache_path(size))
+        print 'Cached %sx%s tables in %s' % (size,size,cache_path(size))
@@ -1,7 +1,37 @@
 #!/usr/bin/python -tt
+import StringIO
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
 import unittest
+import batch
+import gamelog
+import profiling
+import render
+import sessions
+import solver
+import tables
+import tournament
+import verify
 from tictactoe import *
 
+def setUpModule():
+    '''Tables built while testing are cached in a temporary directory instead of the user's cache'''
+    global cache, environ
+    cache = tempfile.mkdtemp()
+    environ = os.environ.get('TICTACTOE_CACHE')
+    os.environ['TICTACTOE_CACHE'] = cache
+
+def tearDownModule():
+    shutil.rmtree(cache)
+    if environ is None:
+        del os.environ['TICTACTOE_CACHE']
+    else:
+        os.environ['TICTACTOE_CACHE'] = environ
+
 class TestSquare(unittest.TestCase):
     def setUp(self):
         self.marked_square = Square(0,0)
@@ -19,6 +49,21 @@ class TestSquare(unittest.TestCase):
         self.assertEquals(self.unmarked_square,Square( self.unmarked_square.x, self.unmarked_square.y ))
         self.assertNotEquals(self.unmarked_square,self.marked_square)
 
+    def test_hash(self):
+        '''Squares at the same coordinates should hash the same and have no instance dictionary'''
+        self.assertEquals( hash(Square(2,1)), hash(Square(2,1)) )
+        self.assertEquals( len(set([ Square(0,0), Square(0,0), Square(1,0) ])), 2 )
+        self.assertFalse( hasattr(self.unmarked_square,'__dict__') )
+
+    def test_square_ids(self):
+        '''Square ids should be unique, below n*n for an nxn board and map back to their coordinates'''
+        for size in [1,3,10]:
+            ids = [ square_id(x,y) for x in range(size) for y in range(size) ]
+            self.assertEquals( sorted(ids), range(size * size) )
+            for x in range(size):
+                for y in range(size):
+                    self.assertEquals( square_coordinates(square_id(x,y)), (x,y) )
+
 
 class TestPath(unittest.TestCase):
     def setUp(self):
@@ -46,6 +91,14 @@ class TestPath(unittest.TestCase):
         self.assertTrue( Square(0,0) not in self.horizontal_path )
         self.setUp()
 
+    def test_copy(self):
+        '''A copied path should be independent of the original'''
+        path = self.horizontal_path.copy()
+        path.remove( Square(0,1) )
+        self.assertEquals( path.squares, [ Square(0,0), Square(0,2) ] )
+        self.assertEquals( self.horizontal_path.rank(), 3 )
+        self.assertEquals( path.direction, Path.HORIZONTAL )
+
     def test_line_slope_intersect(self):
         '''
         Ensures the correct m and b values for slope-intersect calculations is correct.
@@ -212,16 +265,106 @@ class TestGame(unittest.TestCase):
         self.assertEquals( self.game.available_corner(), (None,None) )
         self.setUp()
 
+    def test_copy(self):
+        '''A copy should have the same board and player state but share no Squares with the original'''
+        self.game.player.marker = 'X'
+        self.game.computer.marker = 'O'
+        self.game.player.move(self.game,self.game.computer,0,0)
+        game = self.game.copy()
+
+        self.assertEquals( game.squares_played, 2 )
+        self.assertEquals( game.computer.occupations, self.game.computer.occupations )
+        self.assertEquals( [ p.squares for p in game.player.paths ], [ p.squares for p in self.game.player.paths ] )
+        self.assertFalse( game.square(0,0) is self.game.square(0,0) )
+
+        game.player.move(game,game.computer,2,2)
+        self.assertFalse( self.game.is_played(2,2) )
+        self.assertEquals( len(self.game.player.occupations), 1 )
+        self.setUp()
+
+    def test_path_weights(self):
+        '''
+        On an even board the two diagonals never cross, but Path.intersection() rounds their
+        crossing down to the square beside the middle on the computer's diagonal
+        '''
+        game = Game(4)
+        game.occupy(0,0,'X')
+        game.occupy(0,3,'O')
+        game.computer.paths = [ Path([ game.square(i,i) for i in range(1,4) ],Path.DIAGONAL) ]
+        game.player.paths = [ Path([ game.square(i,3-i) for i in range(1,4) ],Path.DIAGONAL_INVERSE) ]
+        self.assertEquals( game.path_weights(game.computer,game.player), {5:1.0 / 3} )
+        self.assertEquals( game.path_weights(game.player,game.computer), {6:1.0 / 3} )
+
+    def test_best_intersection(self):
+        '''
+        The weights and chosen squares, ties included, should be those of the per-pair loop that
+        Player.move() used before the weights were found by the game, with and without NumPy
+        '''
+        def loop_weights(game,player,opponent):
+            weights = {}
+            for my_path in player.paths:
+                for opp_path in opponent.paths:
+                    x,y = my_path.intersection(opp_path)
+                    if x != None and y != None and not game.is_played(x,y):
+                        key = game.coordinate_key(x,y)
+                        if not weights.has_key(key):
+                            weights[key] = 0.0
+                        weights[key] += 1.0 / min(my_path.rank(),opp_path.rank())
+            return weights
+
+        def loop_choice(weights):
+            if len(weights.values()) > 0:
+                max_weight = max(weights.values())
+                for key,weight in weights.items():
+                    if weight == max_weight:
+                        return divmod(key,size)
+            return (None,None)
+
+        min_pairs = Game.NUMPY_MIN_PAIRS
+        for size in range(3,10):
+            for seed in range(30):
+                random.seed(seed)
+                game = Game(size)
+                game.play(seed % 2 == 0)
+                while game.state == Game.STATE_IN_PROGRESS:
+                    computer,player = game.computer,game.player
+                    if ( computer.paths and player.paths and
+                         computer.paths[0].rank() > 1 and player.paths[0].rank() > 1 ):
+                        expected = loop_weights(game,computer,player)
+                        try:
+                            for Game.NUMPY_MIN_PAIRS in [0,sys.maxint]:
+                                weights = game.path_weights(computer,player)
+                                self.assertEquals( weights.items(), expected.items() )
+                                self.assertEquals( game.best_intersection(computer,player), loop_choice(expected) )
+                        finally:
+                            Game.NUMPY_MIN_PAIRS = min_pairs
+
+                    x,y = game.available_square()
+                    game.player.move(game,game.computer,x,y)
+
+    def test_history(self):
+        '''The history alternates between players starting with X'''
+        self.game.play(False)
+        self.game.player.move(self.game,self.game.computer,0,1)
+        self.assertEquals( self.game.history(), [('X',0,1),('O',1,1)] )
+        self.setUp()
+
     def test_play(self):
         '''
-        To ensure the computer AI mechanisms are "smart" enough to play and not
-        lose in any case, simulate fully automated games for 3x3, 4x4 and 5x5. The
-        AI should be smart enough to know not to lose and simply wait for a "dumb" 
-        move by the player. This test should PASS if a "dumb" player will make random
-        moves and the game either results in a win for the computer or a draw
+        To prove the computer AI never loses on a 3x3 board, every possible sequence of
+        opponent moves is played against every possible random choice the computer can make.
+        '''
+        self.assertEquals( verify.verify(3), None )
+
+    def test_play_sampled(self):
+        '''
+        Larger boards are too big to verify exhaustively here, so simulate fully automated
+        games for 4x4 up to 9x9. The AI should be smart enough to know not to lose and simply
+        wait for a "dumb" move by the player. This test should PASS if a "dumb" player will
+        make random moves and the game either results in a win for the computer or a draw
         '''
         num_games = 500
-        sizes = range(3,10)
+        sizes = range(4,10)
 
         for size in sizes:
             for i in range(num_games):
@@ -385,6 +528,897 @@ class TestPlayer(unittest.TestCase):
         self.assertEquals( self.game.winner, self.game.computer.marker )
         self.setUp()
 
+    def test_occupations(self):
+        '''Occupations should keep the order squares were played in and index them for membership'''
+        occupations = Occupations([ Square(2,2), Square(0,1) ])
+        occupations.append( Square(1,0) )
+        self.assertEquals( len(occupations), 3 )
+        self.assertEquals( occupations[-1], Square(1,0) )
+        self.assertEquals( occupations[:2], [ Square(2,2), Square(0,1) ] )
+        self.assertEquals( occupations, [ Square(2,2), Square(0,1), Square(1,0) ] )
+        self.assertTrue( Square(0,1) in occupations )
+        self.assertTrue( Square(1,1) not in occupations )
+        self.assertRaises( IndexError, occupations.__getitem__, 3 )
+
+    def test_interned_squares(self):
+        '''Occupations and paths should give the game's own Squares, in copies of the game too'''
+        self.game.player.move(self.game,self.game.computer,1,1)
+        for game in [self.game,self.game.copy()]:
+            for player in [game.computer,game.player]:
+                square = player.occupations[-1]
+                self.assertTrue( square is game.square(square.x,square.y) )
+                self.assertTrue( square.marked() )
+                for path in player.paths:
+                    self.assertTrue( path[0] is game.square(path[0].x,path[0].y) )
+                    self.assertEquals( [ s is game.square(s.x,s.y) for s in path ], [True] * path.rank() )
+
+    def test_place(self):
+        '''Placing a marker should update the player and end the game without the opponent responding'''
+        self.game.player.place(self.game,self.game.computer,0,0)
+        self.assertTrue( self.game.is_played(0,0) )
+        self.assertEquals( self.game.squares_played, 1 )
+        self.assertEquals( len(self.game.player.paths), 3 )
+        self.assertEquals( self.game.computer.occupations, [] )
+
+        for x,y in [(0,1),(0,2)]:
+            self.game.player.place(self.game,self.game.computer,x,y)
+        self.assertEquals( self.game.state, Game.STATE_COMPLETE )
+        self.assertEquals( self.game.winner, self.game.player.marker )
+
+    def test_seeded_moves(self):
+        '''Games given equally seeded random number generators should make the same choices'''
+        games = [ Game(5,rng=random.Random(3)) for i in range(2) ]
+        for game in games:
+            game.play(True)
+            while game.state == Game.STATE_IN_PROGRESS:
+                x,y = game.available_square()
+                game.player.move(game,game.computer,x,y)
+        self.assertEquals( games[0].history(), games[1].history() )
+
+
+class TestSparseGame(unittest.TestCase):
+    def setUp(self):
+        self.game = SparseGame(1000)
+
+    def test_square(self):
+        '''Only played squares are stored, but any square on the board can be retrieved'''
+        self.assertEquals( self.game.square(500,20), Square(500,20) )
+        self.assertEquals( self.game.square(1001), Square(1,1) )
+        self.assertRaises( IndexError, self.game.square, 1000, 0 )
+        self.assertEquals( len(self.game.occupied), 0 )
+
+        self.game.occupy(500,20,'X')
+        self.assertTrue( self.game.is_played(500,20) )
+        self.assertTrue( self.game.square(500,20).marked() )
+        self.assertEquals( len(self.game.occupied), 1 )
+        self.setUp()
+
+    def test_lines(self):
+        '''Lines are only indexed once a square along them has been played'''
+        self.assertEquals( len(self.game.lines), 0 )
+        self.game.occupy(10,20,'X')
+        self.assertEquals( len(self.game.lines), 2 )
+        self.game.occupy(10,10,'O')
+        self.assertEquals( len(self.game.lines), 4 )
+        self.assertEquals( self.game.line(Path.HORIZONTAL,10), [Square(10,20),Square(10,10)] )
+        self.assertEquals( self.game.line(Path.DIAGONAL_INVERSE,0), [] )
+        self.setUp()
+
+    def test_line_path(self):
+        '''A LinePath behaves like a Path of the unowned squares along its line'''
+        self.game.occupy(0,0,'X')
+        path = LinePath(self.game,Path.DIAGONAL,0,[(0,0)])
+        self.assertEquals( path.rank(), 999 )
+        self.assertEquals( path[0], Square(1,1) )
+        self.assertEquals( path[-1], Square(999,999) )
+        self.assertTrue( Square(5,5) in path )
+        self.assertFalse( Square(0,0) in path )
+        self.assertFalse( Square(5,6) in path )
+
+        path.remove( Square(1,1) )
+        self.assertEquals( path[0], Square(2,2) )
+        self.assertEquals( path.rank(), 998 )
+        self.setUp()
+
+    def test_copy(self):
+        '''A copy should be a SparseGame with its own squares, line index and win paths'''
+        self.game.play(True)
+        for i in range(5):
+            x,y = self.game.available_square()
+            self.game.player.move(self.game,self.game.computer,x,y)
+        game = self.game.copy()
+
+        self.assertTrue( isinstance(game,SparseGame) )
+        self.assertEquals( game.history(), self.game.history() )
+        self.assertEquals( game.last_played, self.game.last_played )
+        self.assertEquals( game.lines, self.game.lines )
+        for x,y in self.game.occupied:
+            self.assertTrue( game.square(x,y) is not self.game.square(x,y) )
+            self.assertTrue( game.square(x,y) in game.line(Path.HORIZONTAL,x) )
+        for player in ['computer','player']:
+            paths = getattr(game,player).paths
+            self.assertEquals( [ (p.direction,p.index,p.owned) for p in paths ],
+                               [ (p.direction,p.index,p.owned) for p in getattr(self.game,player).paths ] )
+            self.assertEquals( [ p.game for p in paths ], [game] * len(paths) )
+
+        x,y = game.available_square()
+        game.player.move(game,game.computer,x,y)
+        self.assertEquals( self.game.squares_played, 11 )
+        self.assertEquals( len(self.game.occupied), 11 )
+        self.setUp()
+
+    def test_available_edge(self):
+        '''Edges are chosen in the same order as a regular Game'''
+        for size in [3,4,5]:
+            sparse,game = SparseGame(size),Game(size)
+            for i in range(4 * (size - 2)):
+                x,y = game.available_edge()
+                self.assertEquals( sparse.available_edge(), (x,y) )
+                game.occupy(x,y,'X')
+                sparse.occupy(x,y,'X')
+            self.assertEquals( sparse.available_edge(), (None,None) )
+
+    def test_available_center(self):
+        '''Random points are sampled from the unplayed squares'''
+        game = SparseGame(3)
+        self.assertEquals( game.available_center(), (1,1) )
+        game.occupy(1,1,'X')
+        self.assertEquals( game.available_center(), (None,None) )
+        x,y = self.game.available_center()
+        self.assertTrue( 0 < x < 999 and 0 < y < 999 )
+
+    def test_play(self):
+        '''
+        With the same random choices, the computer should make exactly the same moves as it would
+        in a regular Game
+        '''
+        def play(game,seed):
+            random.seed(seed)
+            opponent = random.Random(seed)
+            game.play(True)
+            while game.state == Game.STATE_IN_PROGRESS:
+                free = [ (x,y) for x in range(game.size) for y in range(game.size) if not game.is_played(x,y) ]
+                x,y = opponent.choice(free)
+                game.player.move(game,game.computer,x,y)
+            return game.computer.occupations,game.state,game.winner
+
+        for size in range(3,7):
+            for seed in range(20):
+                self.assertEquals( play(SparseGame(size),seed), play(Game(size),seed) )
+
+    def test_large_board(self):
+        '''Moves on a large board only touch the squares and lines that were played'''
+        self.game.play(True)
+        for i in range(50):
+            x,y = self.game.available_square()
+            self.game.player.move(self.game,self.game.computer,x,y)
+        self.assertEquals( self.game.state, Game.STATE_IN_PROGRESS )
+        self.assertEquals( len(self.game.occupied), 101 )
+        self.assertTrue( len(self.game.lines) <= 4 * 101 )
+        self.setUp()
+
+    def test_print_board(self):
+        '''Only a window around the last move is printed, however far apart the moves are'''
+        for x,y,marker in [(0,0,'X'),(999,999,'O'),(500,7,'X')]:
+            self.game.occupy(x,y,marker)
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            self.game.print_board()
+            lines = sys.stdout.getvalue().split('\n')
+        finally:
+            sys.stdout = stdout
+        self.assertTrue( lines[1].split() == [ str(y) for y in range(15) ] )
+        self.assertTrue( lines[2].startswith(' 493 ') )
+        self.assertEquals( lines[16].split('|')[7].strip(), 'X' )
+        self.assertEquals( len(lines), 35 )
+        self.assertTrue( lines[-3].startswith('2 more played squares') )
+        self.setUp()
+
+
+class TestBatch(unittest.TestCase):
+    def test_parse_position(self):
+        '''Boards should be square, at least 3x3 and reachable with X moving first'''
+        self.assertEquals( batch.parse_position('X-..O....'), (3,[0],[4]) )
+        for board in ['XO','X...O...','XX.......','X...Q....']:
+            self.assertRaises( ValueError, batch.parse_position, board )
+
+    def test_best_move(self):
+        '''The side to move should take a win, block a loss and have no move in a finished game'''
+        self.assertEquals( batch.best_move('XX.OO....'), (0,2) )
+        self.assertEquals( batch.best_move('XX.O.....'), (0,2) )
+        self.assertEquals( batch.best_move('XXXOO....'), None )
+        self.assertEquals( batch.best_move('XOXXOOOXX'), None )
+        self.assertEquals( batch.best_move('.........',3), batch.best_move('.........',3) )
+
+    def test_run(self):
+        '''Moves should be written in the order the positions were read, in both formats'''
+        boards = ['XX.OO....','XXXOO....','XX.O.....'] * 5
+        output = StringIO.StringIO()
+        batch.run(StringIO.StringIO('\n'.join(boards) + '\n\n'),output)
+        self.assertEquals( output.getvalue(), '0 2\n-\n0 2\n' * 5 )
+
+        records = ''.join([ struct.pack('<H',len(board)) + board for board in boards ])
+        output = StringIO.StringIO()
+        batch.run(StringIO.StringIO(records),output,binary=True)
+        self.assertEquals( output.getvalue(), '\x00\x02\xff\xff\x00\x02' * 5 )
+        self.assertRaises( ValueError, batch.run, StringIO.StringIO(records[:-1]), output, True )
+
+    def test_invalid(self):
+        '''A bad position should get the invalid marker without stopping the positions after it'''
+        boards = ['XX.OO....','XXX......','XQ.......','XO','XX.O.....']
+        output = StringIO.StringIO()
+        batch.run(StringIO.StringIO('\n'.join(boards) + '\n'),output)
+        self.assertEquals( output.getvalue(), '0 2\n!\n!\n!\n0 2\n' )
+
+        records = ''.join([ struct.pack('<H',len(board)) + board for board in boards ])
+        output = StringIO.StringIO()
+        batch.run(StringIO.StringIO(records),output,binary=True)
+        self.assertEquals( output.getvalue(), '\x00\x02' + '\xfe\xfe' * 3 + '\x00\x02' )
+
+        # Errors while playing a valid position are not mistaken for invalid positions
+        def fail(size,xs,os,seed=0):
+            raise ValueError('engine bug')
+        play_position = batch.play_position
+        batch.play_position = fail
+        try:
+            self.assertRaises( ValueError, batch.play_chunk, (['XX.OO....'],False,99) )
+        finally:
+            batch.play_position = play_position
+        self.assertEquals( batch.play_chunk((['.' * 255 * 255],True,0)), '\xfe\xfe' )
+
+    def test_chunks(self):
+        '''Lines and records split across reads should be put back together'''
+        chunks = list(batch.text_chunks(StringIO.StringIO('X........\n.X.......\n..X......'),4))
+        self.assertEquals( sum(chunks,[]), ['X........','.X.......','..X......'] )
+        records = struct.pack('<H',9) + 'X........' + struct.pack('<H',9) + '.X.......'
+        chunks = list(batch.binary_chunks(StringIO.StringIO(records),5))
+        self.assertEquals( sum(chunks,[]), ['X........','.X.......'] )
+
+    def test_processes(self):
+        '''Positions handed out to worker processes should give the same output in the same order'''
+        boards = [ ''.join(random.choice('XO.') for i in range(9)) for j in range(2000) ]
+        boards = [ board for board in boards if board.count('X') - board.count('O') in [0,1] ]
+        text = '\n'.join(boards) + '\n'
+        single,pooled = StringIO.StringIO(),StringIO.StringIO()
+        batch.run(StringIO.StringIO(text),single)
+        batch.run(StringIO.StringIO(text),pooled,processes=2,chunk_bytes=100)
+        self.assertEquals( pooled.getvalue(), single.getvalue() )
+
+
+class TestGameLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory,'games.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def play(self,log=None):
+        '''A game where the computer moves first and the player blocks badly'''
+        game = Game(3,rng=random.Random(0))
+        recorder = gamelog.record(game,log)
+        game.play(True)
+        x,y = [ (x,y) for x,y in [(1,0),(0,1)] if not game.is_played(x,y) ][0]
+        while game.state == Game.STATE_IN_PROGRESS:
+            game.player.move(game,game.computer,x,y)
+            x,y = game.available_square()
+        return game,recorder
+
+    def test_record(self):
+        '''Every move should be recorded with its marker and the branch that chose it'''
+        game,recorder = self.play()
+        keys,codes,deltas = recorder.arrays()
+        self.assertEquals( len(keys), game.squares_played )
+        self.assertEquals( [ (key / 3,key % 3) for key in keys ], [ (x,y) for marker,x,y in game.history() ] )
+        self.assertEquals( codes[0], gamelog.MARKER_CODES['X'] | Player.MOVE_FIRST )
+        self.assertEquals( codes[1], gamelog.MARKER_CODES['O'] | Player.MOVE_PLACED )
+
+    def test_ring_buffer(self):
+        '''Only the most recent moves should be kept once the buffer is full'''
+        recorder = gamelog.MoveRecorder(3)
+        for key in range(5):
+            recorder.record(key,'XO'[key % 2],Player.MOVE_PATH)
+        keys,codes,deltas = recorder.arrays()
+        self.assertEquals( list(keys), [2,3,4] )
+        self.assertEquals( [ code >> gamelog.BRANCH_BITS for code in codes ], [1,2,1] )
+
+    def test_grow(self):
+        '''A recorder for a large board should only grow its arrays as moves are recorded'''
+        recorder = gamelog.record(SparseGame(1000))
+        self.assertEquals( recorder.capacity, 1000 * 1000 )
+        self.assertEquals( len(recorder.keys), gamelog.INITIAL_MOVES )
+        for key in range(gamelog.INITIAL_MOVES + 1):
+            recorder.record(key,'XO'[key % 2],Player.MOVE_PATH)
+        self.assertEquals( len(recorder.keys), 2 * gamelog.INITIAL_MOVES )
+        self.assertEquals( list(recorder.arrays()[0]), range(gamelog.INITIAL_MOVES + 1) )
+
+        recorder = gamelog.MoveRecorder(gamelog.INITIAL_MOVES + 10)
+        for key in range(gamelog.INITIAL_MOVES + 12):
+            recorder.record(key,'X',Player.MOVE_PATH)
+        self.assertEquals( len(recorder.codes), gamelog.INITIAL_MOVES + 10 )
+        self.assertEquals( list(recorder.arrays()[0]), range(2,gamelog.INITIAL_MOVES + 12) )
+
+    def test_log(self):
+        '''Completed games should be written when the log is closed and read back'''
+        log = gamelog.GameLog(self.path,sync_interval=60)
+        games = [ self.play(log)[0] for i in range(3) ]
+        self.assertEquals( os.path.getsize(self.path), struct.calcsize(gamelog.FILE_HEADER) )
+        log.close()
+
+        logged = list(gamelog.read(self.path))
+        self.assertEquals( len(logged), 3 )
+        for game,(started,size,computer,state,winner,moves) in zip(games,logged):
+            self.assertEquals( (size,computer,state,winner), (3,'X',game.state,game.winner) )
+            self.assertEquals( [ move[:3] for move in moves ], game.history() )
+            self.assertEquals( moves[0][3], Player.MOVE_FIRST )
+            if game.state == Game.STATE_COMPLETE:
+                self.assertEquals( moves[-1][3], Player.MOVE_WIN )
+
+        # A record cut short at the end of the log is ignored
+        f = open(self.path,'ab')
+        f.write( struct.pack(gamelog.GAME_HEADER,0,3,1,1,1,5) + '\0' * 3 )
+        f.close()
+        self.assertEquals( len(list(gamelog.read(self.path))), 3 )
+
+    def test_sync_interval(self):
+        '''Buffered games should be written once the sync interval has passed'''
+        log = gamelog.GameLog(self.path,sync_interval=60)
+        self.play(log)
+        self.assertEquals( os.path.getsize(self.path), struct.calcsize(gamelog.FILE_HEADER) )
+        log.last_sync -= 60
+        self.play(log)
+        self.assertEquals( len(list(gamelog.read(self.path))), 2 )
+        self.assertEquals( log.pending, [] )
+        log.close()
+
+    def test_rotate(self):
+        '''The log should be rotated before it grows past its maximum size'''
+        log = gamelog.GameLog(self.path,max_bytes=150,backups=2,buffer_bytes=0)
+        for i in range(8):
+            self.play(log)
+        log.close()
+        self.assertTrue( os.path.exists(self.path + '.2') )
+        self.assertFalse( os.path.exists(self.path + '.3') )
+        for path in [self.path,self.path + '.1',self.path + '.2']:
+            self.assertTrue( os.path.getsize(path) <= 150 )
+            self.assertTrue( len(list(gamelog.read(path))) >= 1 )
+
+
+class TestProfiling(unittest.TestCase):
+    def test_deterministic(self):
+        '''Every call made by the engine should be counted and timed under its class'''
+        profile = profiling.run(3,4)
+        self.assertEquals( sys.getprofile(), None )
+        self.assertEquals( profile.calls['profiling.play'], 1 )
+        for name in ['Player.strategize','Player.destrategize','Player.sort_paths','Game.print_board',
+                     'Game.__permute_and_choose_point','list.sort']:
+            self.assertTrue( profile.calls[name] > 0 )
+            self.assertTrue( 0 <= profile.own[name] <= profile.total[name] <= profile.total['profiling.play'] )
+        self.assertAlmostEquals( profile.elapsed(), profile.total['profiling.play'] )
+
+        output = StringIO.StringIO()
+        profile.report(output,limit=5)
+        self.assertTrue( 'Player.strategize' in output.getvalue() )
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_crossing_weights(self):
+        '''Intersections weighed with NumPy should be reported under the engine functions'''
+        min_pairs = Game.NUMPY_MIN_PAIRS
+        Game.NUMPY_MIN_PAIRS = 0
+        try:
+            profile = profiling.run(4,2,boards=False)
+        finally:
+            Game.NUMPY_MIN_PAIRS = min_pairs
+        output = StringIO.StringIO()
+        profile.report(output,limit=0)
+        engine = output.getvalue().split('Engine functions')[1]
+        for name in ['Game.best_intersection','Game.path_weights','Game.__crossing_weights']:
+            self.assertTrue( name in engine )
+
+    def test_collapsed(self):
+        '''Collapsed stacks should start at the games being played and end with a count'''
+        for line in profiling.run(3,2,boards=False).collapsed():
+            stack,value = line.rsplit(' ',1)
+            self.assertTrue( stack.startswith('profiling.play') )
+            self.assertTrue( int(value) > 0 )
+
+    def test_sampling(self):
+        '''Samples should only be taken while playing and be counted for every function on the stack'''
+        profile = profiling.run(5,50,profiling.SAMPLING,0.0005)
+        samples = sum(profile.stacks.values())
+        self.assertTrue( samples > 0 )
+        self.assertEquals( profile.total['profiling.play'], samples )
+        self.assertEquals( profile.elapsed(), samples )
+        self.assertEquals( profile.calls, {} )
+
+
+class TestRender(unittest.TestCase):
+    def setUp(self):
+        self.game = Game(12)
+        self.out = StringIO.StringIO()
+        self.renderer = render.BoardRenderer(self.out)
+        self.terminal_size = render.terminal_size
+        render.terminal_size = lambda out: (50,80)
+
+    def tearDown(self):
+        render.terminal_size = self.terminal_size
+
+    def test_write_board(self):
+        '''Small boards are written exactly as print_board() prints them'''
+        game = Game(3)
+        game.play(True)
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            game.print_board()
+            printed = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+        render.write_board(game,self.out)
+        self.assertEquals( self.out.getvalue(), printed )
+
+    def test_write_board_labels(self):
+        '''Row labels are right aligned on boards of 10x10 and up'''
+        render.write_board(self.game,self.out)
+        lines = self.out.getvalue().split('\n')
+        self.assertTrue( lines[2].startswith('  0    |') )
+        self.assertTrue( lines[24].startswith(' 11    |') )
+        self.assertEquals( lines[1].index('11'), lines[2].rindex('|') + 2 )
+
+    def test_update(self):
+        '''Only squares played since the last draw are rewritten'''
+        self.game.play(True)
+        self.renderer.draw(self.game)
+        self.assertTrue( self.out.getvalue().startswith(render.CLEAR_SCREEN) )
+
+        self.out.truncate(0)
+        self.game.player.move(self.game,self.game.computer,5,5)
+        self.renderer.draw(self.game)
+        computer = self.game.computer.occupations[-1]
+        row,column = self.renderer.position(self.game,computer.x,computer.y)
+        self.assertEquals( self.out.getvalue(), render.move_cursor(13,26) + 'O' +
+                           render.move_cursor(row,column) + 'X' + render.move_cursor(27,1) + render.CLEAR_BELOW )
+
+        # The positions should line up with the fully rendered board
+        out = StringIO.StringIO()
+        render.write_board(self.game,out)
+        lines = out.getvalue().split('\n')
+        self.assertEquals( lines[row - 1][column - 1], 'X' )
+        self.assertEquals( lines[12][25], 'O' )
+
+    def test_redraw(self):
+        '''The whole board is redrawn for a new game or when the terminal is resized'''
+        self.game.play(True)
+        self.renderer.draw(self.game)
+        self.out.truncate(0)
+        render.terminal_size = lambda out: (60,100)
+        self.renderer.draw(self.game)
+        self.assertTrue( self.out.getvalue().startswith(render.CLEAR_SCREEN) )
+
+        self.out.truncate(0)
+        self.renderer.draw(Game(12))
+        self.assertTrue( self.out.getvalue().startswith(render.CLEAR_SCREEN) )
+
+        # A terminal too small for the board gets a view of the rows and columns that fit
+        self.out.truncate(0)
+        render.terminal_size = lambda out: (20,30)
+        self.renderer.draw(self.game)
+        lines = self.out.getvalue()[len(render.CLEAR_SCREEN):].split('\n')
+        self.assertEquals( len(lines), 2 * 7 + 3 )
+        self.assertTrue( max([ len(line) for line in lines ]) < 30 )
+        self.assertEquals( len(lines[1].split()), 6 )
+
+    def test_lines_below(self):
+        '''The board is redrawn once more lines than PROMPT_LINES were written below it'''
+        self.game.replay([(0,0),(1,1)])
+        self.renderer.draw(self.game)
+        for lines,redrawn in [(render.BoardRenderer.PROMPT_LINES,False),(render.BoardRenderer.PROMPT_LINES + 1,True)]:
+            self.out.truncate(0)
+            self.renderer.wrote(lines)
+            self.game.replay([(2,0),(3,0)] if not redrawn else [(4,0),(5,0)])
+            self.renderer.draw(self.game)
+            self.assertEquals( self.out.getvalue().startswith(render.CLEAR_SCREEN), redrawn )
+            self.assertEquals( self.renderer.lines_below, 0 )
+
+    def test_scroll(self):
+        '''The view scrolls to a move outside it, and only moves inside it are rewritten'''
+        render.terminal_size = lambda out: (20,30)
+        self.game.replay([(0,0),(1,1)])
+        self.renderer.draw(self.game)
+        self.assertEquals( (self.renderer.rows,self.renderer.columns), (range(7),range(6)) )
+
+        self.out.truncate(0)
+        self.game.replay([(2,0),(3,0)])
+        self.renderer.draw(self.game)
+        self.assertEquals( self.out.getvalue(), render.move_cursor(7,6) + 'X' + render.move_cursor(9,6) + 'O' +
+                           render.move_cursor(17,1) + render.CLEAR_BELOW )
+
+        self.out.truncate(0)
+        self.game.replay([(11,11),(10,10)])
+        self.renderer.draw(self.game)
+        self.assertTrue( self.out.getvalue().startswith(render.CLEAR_SCREEN) )
+        self.assertEquals( (self.renderer.rows,self.renderer.columns), (range(5,12),range(6,12)) )
+
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory,'sessions')
+        self.store = sessions.SessionStore(self.path,capacity=2,max_size=4,initial_slots=1)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def play(self,size,moves,computer_first=True):
+        '''Starts a game and has the player make moves at each available square in order'''
+        game = Game(size)
+        game.play(computer_first)
+        for i in range(moves):
+            x,y = [ (s.x,s.y) for s in game.board if not s.marked() ][0]
+            game.player.move(game,game.computer,x,y)
+        return game
+
+    def assertSameGame(self,first,second):
+        self.assertEquals( first.history(), second.history() )
+        self.assertEquals( (first.state,first.winner), (second.state,second.winner) )
+        for player in ['computer','player']:
+            self.assertEquals( getattr(first,player).marker, getattr(second,player).marker )
+            self.assertEquals( [ (p.direction,p.squares) for p in getattr(first,player).paths ],
+                               [ (p.direction,p.squares) for p in getattr(second,player).paths ] )
+
+    def test_pack(self):
+        '''Packing and unpacking a game should rebuild its board, occupations and win paths'''
+        for size,moves,computer_first in [(3,0,True),(3,1,False),(4,3,True),(4,2,False)]:
+            game = self.play(size,moves,computer_first)
+            session_id,restored = sessions.unpack( sessions.pack(42,game) )
+            self.assertEquals( session_id, 42 )
+            self.assertSameGame( restored, game )
+
+    def test_spill(self):
+        '''Only capacity games are kept live, the least recently used are spilled to slots'''
+        games = [ self.play(3,1), self.play(4,2), self.play(3,2,False) ]
+        for i,game in enumerate(games):
+            self.store.put(i,game)
+        self.assertEquals( len(self.store), 3 )
+        self.assertEquals( self.store.live.keys(), [1,2] )
+        self.assertEquals( self.store.slots.keys(), [0] )
+
+        # Faulting a game back in spills the least recently used live game into the freed slot
+        game = self.store.get(0)
+        self.assertFalse( game is games[0] )
+        self.assertSameGame( game, games[0] )
+        self.assertEquals( self.store.live.keys(), [2,0] )
+        self.assertEquals( self.store.slots, {1:0} )
+        self.assertTrue( self.store.get(2) is games[2] )
+
+        # The restored game can be played on
+        x,y = [ (s.x,s.y) for s in game.board if not s.marked() ][0]
+        game.player.move(game,game.computer,x,y)
+        self.assertEquals( game.squares_played, 5 )
+
+    def test_grow(self):
+        '''The file grows when there are no free slots'''
+        for i in range(10):
+            self.store.put(i,self.play(3,1))
+        self.assertEquals( len(self.store.slots), 8 )
+        self.assertEquals( self.store.slot_count, 8 )
+        self.assertEquals( sorted(self.store.slots.values()), range(8) )
+
+    def test_discard(self):
+        '''Discarded games free their slots'''
+        for i in range(3):
+            self.store.put(i,self.play(3,1))
+        self.store.discard(0)
+        self.store.discard(2)
+        self.assertEquals( len(self.store), 1 )
+        self.assertFalse( 0 in self.store )
+        self.assertEquals( self.store.free, [0] )
+        self.assertRaises( KeyError, self.store.get, 0 )
+
+    def test_reopen(self):
+        '''Games in the file are available again after the store is reopened'''
+        games = [ self.play(3,1), self.play(4,3) ]
+        for i,game in enumerate(games):
+            self.store.put(i * 1000,game)
+        self.store.close()
+
+        # The file keeps the slots it was created with, even when smaller boards are asked for
+        self.store = sessions.SessionStore(self.path,capacity=2,max_size=3)
+        self.assertEquals( self.store.max_size, 4 )
+        self.assertEquals( len(self.store), 2 )
+        self.assertEquals( sorted(self.store.slots), [0,1000] )
+        self.assertSameGame( self.store.get(1000), games[1] )
+        self.assertSameGame( self.store.get(0), games[0] )
+
+    def test_reopen_mismatch(self):
+        '''Files with slots too small for max_size, or that are not session files, are refused'''
+        self.store.put(0,self.play(3,1))
+        self.store.close()
+        self.assertRaises( ValueError, sessions.SessionStore, self.path, max_size=5 )
+
+        f = open(self.path,'wb')
+        f.write('not a session file')
+        f.close()
+        self.assertRaises( ValueError, sessions.SessionStore, self.path )
+        self.store = sessions.SessionStore(os.path.join(self.directory,'other'))
+
+    def test_max_size(self):
+        '''Boards larger than the slots can hold are rejected'''
+        self.assertRaises( ValueError, self.store.put, 0, Game(5) )
+
+    def test_round_trip(self):
+        '''Games that can't be rebuilt from a slot are rejected, and solved games keep their solution'''
+        self.assertRaises( ValueError, self.store.put, 0, SparseGame(3) )
+        self.assertRaises( ValueError, self.store.put, 0, Game(3,rng=random.Random(0)) )
+        self.assertRaises( ValueError, self.store.put, 0, Game(3,solution=object()) )
+
+        solution = object()
+        self.store.close()
+        self.store = sessions.SessionStore(self.path,capacity=1,max_size=4,solutions={3:solution})
+        game = self.play(3,1)
+        game.solution = solution
+        self.store.put(0,game)
+        self.store.put(1,self.play(3,1))
+        restored = self.store.get(0)
+        self.assertFalse( restored is game )
+        self.assertTrue( restored.solution is solution )
+        self.assertTrue( self.store.get(1).solution is None )
+
+
+class TestTables(unittest.TestCase):
+    def setUp(self):
+        self.cache = tempfile.mkdtemp()
+        self.environ = os.environ.get('TICTACTOE_CACHE')
+        os.environ['TICTACTOE_CACHE'] = self.cache
+        self.tables = tables.build(3)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache)
+        if self.environ is None:
+            del os.environ['TICTACTOE_CACHE']
+        else:
+            os.environ['TICTACTOE_CACHE'] = self.environ
+
+    def test_square_classes(self):
+        '''Square classes should agree with the corners and edges of a SparseGame, found from coordinates'''
+        for size in [3,4,7]:
+            game,sparse = Game(size),SparseGame(size)
+            for square in game.board:
+                self.assertEquals( game.is_corner(square), sparse.is_corner(square) )
+                self.assertEquals( game.is_edge(square), sparse.is_edge(square) )
+            self.assertEquals( len([ s for s in game.board if game.is_corner(s) ]), 4 )
+            self.assertEquals( len([ s for s in game.board if game.is_edge(s) ]), 4 * (size - 2) )
+        self.assertEquals( list(self.tables.edges), [1,3,5,7] )
+
+    def test_lines(self):
+        '''Lines are rows, then columns, then the diagonal and the inverse diagonal'''
+        self.assertEquals( list(self.tables.lines[0:9]), range(9) )
+        self.assertEquals( list(self.tables.lines[9:12]), [0,3,6] )
+        self.assertEquals( list(self.tables.lines[18:24]), [0,4,8,2,4,6] )
+
+    def test_save_and_load(self):
+        '''Tables should survive a round trip through the cache file'''
+        path = tables.cache_path(3)
+        tables.save(self.tables,path)
+        loaded = tables.load(path,3)
+        for name in tables.Tables.NAMES:
+            self.assertEquals( getattr(loaded,name), getattr(self.tables,name) )
+
+        # A file for another size is not used
+        self.assertEquals( tables.load(path,4), None )
+        self.assertEquals( tables.load(os.path.join(self.cache,'missing'),3), None )
+
+    def test_load_damaged(self):
+        '''Truncated or padded files are not used, and are rebuilt by get()'''
+        path = tables.cache_path(3)
+        tables.save(self.tables,path)
+        f = open(path,'rb')
+        data = f.read()
+        f.close()
+        for damaged in [data[:-1],data[:-40],data[:60],data + '\0']:
+            f = open(path,'wb')
+            f.write(damaged)
+            f.close()
+            self.assertEquals( tables.load(path,3), None )
+
+        registry = tables._registry.copy()
+        tables._registry.clear()
+        try:
+            self.assertEquals( tables.get(3).lines, self.tables.lines )
+            self.assertEquals( tables.load(path,3).lines, self.tables.lines )
+        finally:
+            tables._registry.clear()
+            tables._registry.update(registry)
+
+    def test_get(self):
+        '''Tables are cached on disk the first time they are needed and reused afterwards'''
+        registry = tables._registry.copy()
+        tables._registry.clear()
+        try:
+            built = tables.get(5)
+            self.assertTrue( os.path.exists(tables.cache_path(5)) )
+            self.assertTrue( tables.get(5) is built )
+
+            tables._registry.clear()
+            self.assertEquals( tables.get(5).edges, built.edges )
+        finally:
+            tables._registry.clear()
+            tables._registry.update(registry)
+
+
+class TestVerify(unittest.TestCase):
+    def test_outcomes(self):
+        '''Every possible random corner should be explored when the computer moves first'''
+        games = list(verify.outcomes(verify.BranchingGame(3),lambda g: g.play(True)))
+        corners = sorted([ (g.computer.occupations[0].x,g.computer.occupations[0].y) for g in games ])
+        self.assertEquals( corners, [(0,0),(0,2),(2,0),(2,2)] )
+
+    def test_search(self):
+        '''A position where the opponent is one move from a win should produce a one move losing line'''
+        game = verify.BranchingGame(3)
+        game.play(False)
+        for x,y,marker in [(0,0,'X'),(0,2,'X'),(2,0,'X'),(1,1,'O'),(2,2,'O'),(2,1,'O')]:
+            game.occupy(x,y,marker)
+        game.player.occupations = [ game.square(0,0), game.square(0,2), game.square(2,0) ]
+        game.computer.occupations = [ game.square(1,1), game.square(2,2), game.square(2,1) ]
+        for x,y in [(0,0),(0,2),(2,0)]:
+            game.player.strategize(game,game.computer,x,y)
+
+        line = verify.search(game,{})
+        self.assertEquals( len(line), 1 )
+        self.assertTrue( line[0] in [('X',0,1),('X',1,0)] )
+
+
+class TestSolver(unittest.TestCase):
+    def setUp(self):
+        fd,self.path = tempfile.mkstemp()
+        os.close(fd)
+        solver.save(3,solver.solve(3,processes=1),self.path)
+        self.solution = solver.load(self.path)
+
+    def tearDown(self):
+        self.solution.close()
+        os.remove(self.path)
+
+    def test_win_lines(self):
+        '''A 3x3 board has 3 rows, 3 columns and 2 diagonals'''
+        lines = solver.win_lines(3)
+        self.assertEquals( len(lines), 8 )
+        self.assertTrue( 0b000000111 in lines )
+        self.assertTrue( 0b001001001 in lines )
+        self.assertTrue( 0b100010001 in lines )
+        self.assertTrue( 0b001010100 in lines )
+
+    def test_position_rank(self):
+        '''Every position should have a distinct rank within the bounds of the table'''
+        ranks = set()
+        for plies in range(10):
+            nx,no = solver.layer_counts(plies)
+            for xs in solver.combinations(range(9),nx):
+                rest = [ sq for sq in range(9) if sq not in xs ]
+                for os in solver.combinations(rest,no):
+                    ranks.add( solver.position_rank(3,list(xs),list(os)) )
+        self.assertEquals( ranks, set(range(solver.layer_offsets(3)[-1])) )
+
+    def test_child_ranks(self):
+        '''The ranks of every position's children should match ranking each child on its own'''
+        for plies in range(9):
+            nx,no = solver.layer_counts(plies)
+            for xs in solver.combinations(range(9),nx):
+                rest = [ sq for sq in range(9) if sq not in xs ]
+                for os in solver.combinations(rest,no):
+                    xs,os = list(xs),list(os)
+                    expected = [None] * 9
+                    for key in range(9):
+                        if key in xs or key in os:
+                            continue
+                        elif nx == no:
+                            expected[key] = solver.position_rank(3,sorted(xs + [key]),os)
+                        else:
+                            expected[key] = solver.position_rank(3,xs,sorted(os + [key]))
+                    self.assertEquals( self.solution.child_ranks(xs,os), expected )
+
+    def test_value(self):
+        '''The empty board is a draw, and values are from the point of view of the side to move'''
+        self.assertEquals( self.solution.value([],[]), (solver.DRAW,9) )
+        # X to move can complete the top row
+        self.assertEquals( self.solution.value([0,1],[3,4]), (solver.WIN,1) )
+        # X has completed the top row
+        self.assertEquals( self.solution.value([0,1,2],[3,4]), (solver.LOSS,0) )
+        # X threatens both the top row and the left column
+        self.assertEquals( self.solution.value([0,1,3],[4,8]), (solver.LOSS,2) )
+
+    def test_load(self):
+        '''Files that are not whole solutions should be rejected with a ValueError'''
+        f = open(self.path,'rb')
+        data = f.read()
+        f.close()
+        for damaged in ['not a solution','',data[:8],data[:-1],data + '\0']:
+            f = open(self.path,'wb')
+            f.write(damaged)
+            f.close()
+            self.assertRaises( ValueError, solver.load, self.path )
+
+    def test_solved_move(self):
+        '''A computer with a solution should take an immediate win'''
+        game = Game(3,self.solution)
+        for x,y,marker in [(0,0,'X'),(1,1,'O'),(0,1,'X'),(2,2,'O')]:
+            player = game.computer if marker == 'X' else game.player
+            game.occupy(x,y,marker)
+            player.occupations.append( game.square(x,y) )
+            player.strategize(game,game.computer if player is game.player else game.player,x,y)
+        game.computer.move(game,game.player)
+        self.assertTrue( game.is_played(0,2) )
+        self.assertEquals( game.state, Game.STATE_COMPLETE )
+        self.assertEquals( game.winner, 'X' )
+
+    def test_solved_play(self):
+        '''A computer with a solution should never lose against random moves'''
+        for i in range(200):
+            game = Game(3,self.solution)
+            game.play(i % 2 == 0)
+            while game.state == Game.STATE_IN_PROGRESS:
+                x,y = game.available_square()
+                game.player.move(game,game.computer,x,y)
+            self.assertNotEquals( game.winner, game.player.marker )
+
+
+
+class TestTournament(unittest.TestCase):
+    def test_schedule(self):
+        '''Each pair of engines should play every size, taking turns to move first'''
+        tasks = tournament.schedule([3,4],['heuristic','random'],4)
+        self.assertEquals( [ task[0] for task in tasks ], range(8) )
+        self.assertEquals( [ task[1] for task in tasks ], [3] * 4 + [4] * 4 )
+        self.assertEquals( [ task[2] for task in tasks[:4] ], ['heuristic','random'] * 2 )
+
+    def test_reproducible(self):
+        '''The same seed should replay every game exactly, and another seed should not'''
+        digest = lambda seed: tournament.run([3,4],['heuristic','random'],20,seed,1).digest()
+        self.assertEquals( digest(1), digest(1) )
+        self.assertNotEquals( digest(1), digest(2) )
+
+    def test_standings(self):
+        '''The computer should never lose to random moves and be rated above them'''
+        standings = tournament.run([3],['heuristic','random'],40,0,1)
+        self.assertEquals( standings.tables[(3,'heuristic')][tournament.LOSS], 0 )
+        self.assertEquals( sum(standings.tables[(3,'random')].values()), 40 )
+        ratings = standings.ratings(3)
+        self.assertTrue( ratings['heuristic'] > ratings['random'] )
+        self.assertEquals( len(standings.latencies[(3,'random')]) > 0, True )
+
+    def test_forfeit(self):
+        '''An engine with no move should lose the game, but an engine that crashes stops the tournament'''
+        def no_move(game,player,opponent):
+            raise tournament.NoMove()
+        def failing_move(game,player,opponent):
+            raise ValueError('engine bug')
+        tournament.ENGINES['none'] = no_move
+        tournament.ENGINES['failing'] = failing_move
+        try:
+            result = tournament.play_match( (0,0,3,'none','random') )
+            self.assertEquals( result[4], tournament.LOSS )
+            self.assertEquals( result[5], () )
+
+            try:
+                tournament.play_match( (0,0,3,'random','failing') )
+                self.fail('the crash was not raised')
+            except RuntimeError, e:
+                self.assertTrue( 'failing engine failed in game 0' in str(e) )
+                self.assertTrue( 'ValueError: engine bug' in str(e) )
+        finally:
+            del tournament.ENGINES['none']
+            del tournament.ENGINES['failing']
+
+    def test_percentile(self):
+        self.assertEquals( tournament.percentile(range(1,101),50), 50 )
+        self.assertEquals( tournament.percentile(range(1,101),99), 99 )
+        self.assertEquals( tournament.percentile([],50), None )
+
+
 
 if __name__ == '__main__':
     unittest.main()
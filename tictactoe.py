@@ -1,7 +1,16 @@
 #!/usr/bin/python -tt
-from random import shuffle
-
-class Game:
+import math
+import random
+import tables
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    # NumPy is optional. Without it, move weights are found by walking the players' win paths
+    numpy = None
+
+class Game(object):
     '''
     A Game is the primary component of this application. It is the facilitator of
     user and computer interactions, movements. A Game maintains a state which is
@@ -13,16 +22,40 @@ class Game:
     STATE_COMPLETE = 1
     STATE_DRAW = 2
 
-    def __init__(self,size):
+    # Values of each marker in the board's int8 matrix
+    MARKER_CODES = { 'X':1, 'O':-1 }
+
+    # Whether path_weights() can weigh the players' win paths with NumPy
+    NUMPY_WEIGHTS = numpy is not None
+
+    # Below this many pairs of paths, walking them is faster than weighing them with NumPy
+    NUMPY_MIN_PAIRS = 32
+
+    __slots__ = ['board','grid','state','size','winner','squares_played','rng','solution','computer','player',
+                 'recorder']
+
+    def __init__(self,size,solution=None,rng=None):
         self.board = self.__make_board(size)
+        # The board's marks as an int8 matrix, only made once path_weights() first uses NumPy
+        self.grid = None
         self.state = Game.STATE_IN_PROGRESS
         self.size = size
         self.winner = None
         self.squares_played = 0
 
+        # The source of random choices, a random.Random for reproducible games or the random module
+        self.rng = rng or random
+
+        # An optional solver.Solution for this board size. When present, the computer plays
+        # perfectly by looking up moves instead of using its win-path heuristics
+        self.solution = solution
+
+        # An optional gamelog.MoveRecorder, which is told about every move and the completion
+        self.recorder = None
+
         # Setup players. By default, computer is first and is X
-        self.computer = Player('X')
-        self.player = Player('O')
+        self.computer = Player('X',self)
+        self.player = Player('O',self)
 
     def __make_board(self,size):
         '''
@@ -48,16 +81,16 @@ class Game:
         '''Completes a game with the specified outcome and optional winner'''
         self.state = outcome
         self.winner = winner
+        if self.recorder is not None:
+            self.recorder.complete(self)
 
     def is_corner(self, square):
         '''
         Checks to see if a square is a board corner or not. There are four corners to check
-        for: (0,0), (0,size-1), (size-1,0), (size-1,size-1)
+        for: (0,0), (0,size-1), (size-1,0), (size-1,size-1), which are looked up in the square
+        classes of the precomputed tables for this size
         '''
-        x,y = square.x, square.y
-        return ( (x == 0 and (y == 0 or y == self.size - 1)) or 
-                 (y == 0 and (x == 0 or x == self.size - 1)) or 
-                 (x == self.size - 1 and y == self.size - 1) )
+        return tables.get(self.size).square_classes[ self.coordinate_key(square.x,square.y) ] == tables.CORNER
 
     def is_edge(self, square):
         '''
@@ -65,9 +98,7 @@ class Game:
         edge if x is the first or last row and y is between (0,size) - OR - y is the first 
         or last column and x is between (0,size)
         '''
-        x,y = square.x, square.y
-        return ((x in [0,self.size-1] and y in range(1,self.size-1)) or 
-                (y in [0,self.size-1] and x in range(1,self.size-1)))
+        return tables.get(self.size).square_classes[ self.coordinate_key(square.x,square.y) ] == tables.EDGE
 
     def is_any_edge(self, square):
         '''Checks to see if a square is along the edge of the board (corners and edges)'''
@@ -84,10 +115,17 @@ class Game:
         else:
             return self.board[ self.coordinate_key(x,y) ]
 
-    def occupy(self, x, y, marker):
-        '''Marks a square at an x,y coordinate with a marker and sets it as having been played'''
+    def occupy(self, x, y, marker, branch = 0):
+        '''
+        Marks a square at an x,y coordinate with a marker and sets it as having been played. The
+        branch is the Player.MOVE_* way the move was chosen, which is only kept by a recorder.
+        '''
         self.square(x,y).mark(marker)
+        if self.grid is not None:
+            self.grid[x,y] = Game.MARKER_CODES[marker]
         self.squares_played += 1
+        if self.recorder is not None:
+            self.recorder.record(self.coordinate_key(x,y),marker,branch)
 
     def is_played(self, x, y):
         '''Shorthand for checking if an x,y coordinate has been played or not'''
@@ -97,10 +135,142 @@ class Game:
         '''Squares are available if the squares_played counter < size^2'''
         return self.squares_played < pow(self.size,2)
 
+    def copy(self):
+        '''
+        Creates an independent copy of this game, including the board marks and both players'
+        occupations and win paths. Copies are of the same class as the original and reference
+        only their own Squares.
+        '''
+        game = self.__class__(self.size)
+        game.solution = self.solution
+        game.rng = self.rng
+        game.state = self.state
+        game.winner = self.winner
+        game.squares_played = self.squares_played
+
+        for square in self.board:
+            game.square(square.x,square.y).placemark = square.placemark
+        if self.grid is not None:
+            game.grid = self.grid.copy()
+
+        for source,target in [(self.computer,game.computer),(self.player,game.player)]:
+            target.marker = source.marker
+            target.occupations = Occupations(source.occupations,game)
+            target.paths = [ path.copy(game) for path in source.paths ]
+        return game
+
+    def history(self):
+        '''
+        Returns the moves played so far as a list of (marker,x,y) in the order they were made. X
+        always moves first, so the two players' occupations simply alternate.
+        '''
+        players = sorted([self.computer,self.player], key=lambda player: player.marker != 'X')
+        moves = []
+        for i in range(self.squares_played):
+            player = players[i % 2]
+            square = player.occupations[i / 2]
+            moves.append( (player.marker,square.x,square.y) )
+        return moves
+
+    def replay(self, moves):
+        '''
+        Plays a list of (x,y) moves in order, X first, the way Player.move() records them. Both
+        players' occupations and win paths are rebuilt, but the computer does not respond and the
+        game is not completed.
+        '''
+        players = sorted([self.computer,self.player], key=lambda player: player.marker != 'X')
+        for i,(x,y) in enumerate(moves):
+            player,opponent = players[i % 2],players[(i + 1) % 2]
+            self.occupy(x,y,player.marker)
+            player.occupations.append( self.square(x,y) )
+            player.strategize(self,opponent,x,y)
+
+    def path_weights(self, player, opponent):
+        '''
+        Finds the weights of the unplayed squares where a path of the player crosses a path of the
+        opponent, from the players' win paths. Returns a dictionary of coordinate key to weight.
+        Squares are added in the order their first pair of paths is found, and this order breaks
+        ties between squares in best_intersection().
+        '''
+        if self.NUMPY_WEIGHTS and len(player.paths) * len(opponent.paths) >= self.NUMPY_MIN_PAIRS:
+            return self.__crossing_weights(player.paths,opponent.paths)
+
+        weights = {}
+        for my_path in player.paths:
+            for opp_path in opponent.paths:
+                # Get the intersection point
+                x,y = my_path.intersection(opp_path)
+                if x != None and y != None and not self.is_played(x,y):
+                    # Only evaluate "legal" moves, i.e. non-occupied squares
+                    key = self.coordinate_key(x,y)
+                    if not weights.has_key(key):
+                        weights[key] = 0.0
+                    weights[key] += 1.0 / min(my_path.rank(),opp_path.rank())
+        return weights
+
+    def __crossing_weights(self, paths, opponent_paths):
+        '''
+        The same weights as path_weights() for every pair of paths at once using NumPy. Each pair
+        crosses where Path.intersection() puts it, which for the two diagonals of an even board
+        (that don't cross) is the middle rounded down, and weights are summed in the same order.
+        '''
+        n = self.size
+        if self.grid is None:
+            codes = [ Game.MARKER_CODES.get(square.placemark,0) for square in self.board ]
+            self.grid = numpy.array(codes,numpy.int8).reshape(n,n)
+
+        def lines(paths):
+            '''The directions, rows or columns (of horizontal and vertical paths) and ranks of paths'''
+            directions,indexes,ranks = [],[],[]
+            for path in paths:
+                x,y = square_coordinates(path.ids[0])
+                directions.append(path.direction)
+                indexes.append(y if path.direction == Path.VERTICAL else x)
+                ranks.append(path.rank())
+            return numpy.array(directions),numpy.array(indexes),numpy.array(ranks)
+
+        d0,i0,r0 = [ a[:,None] for a in lines(paths) ]
+        d1,i1,r1 = [ a[None,:] for a in lines(opponent_paths) ]
+
+        # The row and column of each pair's crossing, or -1 where neither path fixes it
+        rows = numpy.where(d0 == Path.HORIZONTAL,i0,numpy.where(d1 == Path.HORIZONTAL,i1,-1))
+        columns = numpy.where(d0 == Path.VERTICAL,i0,numpy.where(d1 == Path.VERTICAL,i1,-1))
+        diagonal = (d0 == Path.DIAGONAL) | (d1 == Path.DIAGONAL)
+        middle = (n - 1) / 2
+        x = numpy.where(rows >= 0,rows,numpy.where(columns >= 0,numpy.where(diagonal,columns,n - 1 - columns),middle))
+        y = numpy.where(columns >= 0,columns,numpy.where(rows >= 0,numpy.where(diagonal,rows,n - 1 - rows),
+                        numpy.where(d0 == Path.DIAGONAL,middle,n - 1 - middle)))
+
+        keys = x * n + y
+        found = (d0 != d1) & (numpy.take(self.grid,keys) == 0)
+        keys = keys[found]
+        values = (1.0 / numpy.minimum(r0,r1))[found]
+
+        # bincount() adds the values of each square in pair order, like the loop in path_weights()
+        sums = numpy.bincount(keys,values,n * n)
+        squares,first = numpy.unique(keys,return_index=True)
+        squares = squares[numpy.argsort(first)]
+        return dict(zip(squares.tolist(),sums[squares].tolist()))
+
+    def best_intersection(self, player, opponent):
+        '''
+        Picks the unplayed square (x,y) with the maximum weight for the player, as found by
+        path_weights(), or (None,None) if no paths of the player and the opponent cross
+        '''
+        weights = self.path_weights(player,opponent)
+        if weights:
+            # If intersection points were found, locate one with a maximum weight
+            # It's OK to break after we find one, we have already guaranteed that these are ALL legal moves
+            max_weight = max(weights.values())
+            for key,weight in weights.items():
+                if weight == max_weight:
+                    return divmod(key,self.size)
+        return (None,None)
+
     def __permute_and_choose_point(self,digit_range):
         '''Permutes a chooses a random available point (x,y) or (None,None)'''
         coords = [(x,y) for x in digit_range for y in digit_range]
-        shuffle(coords)
+        self.rng.shuffle(coords)
         for coord in coords:
             x,y = coord
             if not self.is_played(x,y):
@@ -116,10 +286,10 @@ class Game:
         return self.__permute_and_choose_point([0,self.size-1])
 
     def available_edge(self):
-        '''Picks an unplayed edge at random'''
-        for square in self.board:
-            if self.is_edge(square) and not self.is_played(square.x,square.y):
-                return (square.x,square.y)
+        '''Picks the first unplayed edge in board order, using the precomputed edges for this size'''
+        for key in tables.get(self.size).edges:
+            if not self.board[key].marked():
+                return divmod(key,self.size)
         return (None,None)
 
     def available_center(self):
@@ -139,11 +309,38 @@ class Game:
         
 
 
-class Square:
+def square_id(x,y):
+    '''
+    A compact id for the square x,y that does not depend on the board size. Squares are numbered
+    shell by shell outward from (0,0): the squares with max(x,y) == m have the ids m*m to
+    (m+1)*(m+1) - 1, so every square of an nxn board has an id below n*n.
+    '''
+    m = max(x,y)
+    return m * m + (y if x == m else m + 1 + x)
+
+def square_coordinates(id):
+    '''The x,y coordinate of a square id, see square_id()'''
+    m = int(math.sqrt(id))
+    offset = id - m * m
+    return (m,offset) if offset <= m else (offset - m - 1,m)
+
+def lookup(game,id):
+    '''The Square of game with a square id, or a new Square if there is no game'''
+    if game is None:
+        return Square(*square_coordinates(id))
+    return game.square(*square_coordinates(id))
+
+
+class Square(object):
     '''
     A Square is a basic component of a Board. It maintains an x,y coordinate
-    position and a placemarker which is by default empty.
+    position and a placemarker which is by default empty. A Game holds one Square
+    per cell of its board, while paths and occupations only store square ids and look
+    the Squares up on the board of their game.
+    Squares are equal, and hash the same, if their coordinates are equal.
     '''
+    __slots__ = ['x','y','placemark']
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -158,6 +355,12 @@ class Square:
     def __eq__(self,item):
         return isinstance(item,Square) and item.x == self.x and item.y == self.y
 
+    def __ne__(self,item):
+        return not self.__eq__(item)
+
+    def __hash__(self):
+        return square_id(self.x,self.y)
+
     def mark(self,marker):
         self.placemark = marker
 
@@ -165,34 +368,56 @@ class Square:
         return self.placemark != None
 
 
-class Path:
+class Path(object):
     '''
     A Path represents a collection of moves/squares that ultimately results in a win
     for the player that owns it. Paths are also direction-oriented as in this
     scenario, there are four distinct directions: horizontal, vertical, 
     diagonal and inverse diagonal. Paths also maintain a rank which is analagous to
     the number of moves need to complete the path
+
+    The squares are stored in order as an array of square ids. Indexing or iterating
+    a path gives the game's own Squares, or new Squares for a path without a game.
     '''
     HORIZONTAL = 0
     VERTICAL = 1
     DIAGONAL = 2
     DIAGONAL_INVERSE = 3
 
-    def __init__(self, squares, direction):
+    __slots__ = ['direction','ids','game']
+
+    def __init__(self, squares, direction, game=None):
         self.direction = direction
-        self.squares = squares
+        self.ids = array('i',[ square_id(square.x,square.y) for square in squares ])
+        self.game = game
+
+    def copy(self, game=None):
+        '''A copy of this path, looking its squares up in game'''
+        path = Path([],self.direction,game)
+        path.ids = self.ids[:]
+        return path
+
+    @property
+    def squares(self):
+        return list(self)
 
     def rank(self):
-        return len(self.squares)
+        return len(self.ids)
 
     def __contains__(self, item):
-        return item in self.squares
+        return square_id(item.x,item.y) in self.ids
+
+    def __iter__(self):
+        for id in self.ids:
+            yield lookup(self.game,id)
 
     def __getitem__(self, key):
-        return self.squares[key]
+        if isinstance(key,slice):
+            return [ lookup(self.game,id) for id in self.ids[key] ]
+        return lookup(self.game,self.ids[key])
 
     def remove(self, square):
-        return self.squares.remove(square)
+        self.ids.remove( square_id(square.x,square.y) )
 
     def __repr__(self):
         return 'Path(%s): %s' % (self.rank(),str(self.squares))
@@ -204,8 +429,8 @@ class Path:
         lines are analagous to x = <val>, vertical to y = <val>, diagonal to y = x, and
         diagonal inverse to y = b - x
         '''
-        if len(self.squares) > 1:
-            pt = self.squares[0]
+        if self.rank() > 1:
+            pt = self[0]
 
             if self.direction == Path.DIAGONAL:
                 m = 1
@@ -228,7 +453,7 @@ class Path:
             if Path.HORIZONTAL in [self.direction,path.direction]:
                 # This is a unique case in which one path will have an undefined slope
                 m1,b1 = path.line_slope_intersect() if self.direction == Path.HORIZONTAL else self.line_slope_intersect()
-                x = self.squares[0].x if self.direction == Path.HORIZONTAL else path.squares[0].x
+                x = self[0].x if self.direction == Path.HORIZONTAL else path[0].x
                 y = (m1 * x) + b1
                 return (x,y)
             else:
@@ -242,16 +467,77 @@ class Path:
             return (None,None)
         
 
-class Player:
+class Occupations(object):
+    '''
+    The squares played by a player in the order they were played, stored as square ids along
+    with an index of the ids for membership tests. The index is a bitset, which for the squares
+    of an nxn board never needs more than n*n bits. Like a Path, indexing gives the game's own
+    Squares.
+    '''
+    __slots__ = ['ids','index','game']
+
+    def __init__(self, squares=[], game=None):
+        self.ids = array('i')
+        self.index = 0
+        self.game = game
+        for square in squares:
+            self.append(square)
+
+    def append(self, square):
+        id = square_id(square.x,square.y)
+        self.ids.append(id)
+        self.index |= 1 << id
+
+    def __contains__(self, square):
+        return self.index >> square_id(square.x,square.y) & 1 == 1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for id in self.ids:
+            yield lookup(self.game,id)
+
+    def __getitem__(self, key):
+        if isinstance(key,slice):
+            return [ lookup(self.game,id) for id in self.ids[key] ]
+        return lookup(self.game,self.ids[key])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class Player(object):
     '''
     Should be self-explanatory. One should note that Player objects will also 
     maintain a collection of occupations (Squares) and their optimal paths 
     which are strategized at each move.
     '''
-    def __init__(self,marker):
+    # The ways a move can be chosen, see move()
+    MOVE_PLACED = 0       # A user move, or one chosen outside of move()
+    MOVE_FIRST = 1        # The computer's first move
+    MOVE_WIN = 2          # Completing one of the computer's paths
+    MOVE_BLOCK = 3        # Blocking a path the opponent is one move from completing
+    MOVE_EDGE = 4         # An edge as O when the opponent has taken two corners
+    MOVE_INTERSECTION = 5 # The best square where the computer's and opponent's paths cross
+    MOVE_BACKUP = 6       # Along the computer's best path when no paths cross
+    MOVE_PATH = 7         # Along the computer's best path, or else the opponent's
+    MOVE_SOLVED = 8       # Looked up in the game's solution
+
+    __slots__ = ['marker','paths','occupations']
+
+    def __init__(self,marker,game=None):
         self.marker = marker
         self.paths = []
-        self.occupations = []
+        self.occupations = Occupations(game=game)
 
     def check_winning_move(self,square):
         '''
@@ -279,7 +565,9 @@ class Player:
         
         if x == None and y == None:
             # A Computer Move
-            if not self.occupations:
+            if game.solution is not None:
+                self.solved_move(game,opponent)
+            elif not self.occupations:
                 if self.marker == 'O' and game.is_any_edge(opponent.occupations[-1]):
                     # Choose a nearby "center" square from the opponent's first move
                     x,y = game.available_center()
@@ -287,7 +575,7 @@ class Player:
                     # Prefer a corner on the first move
                     x,y = game.available_corner()
 
-                game.occupy(x,y,self.marker)
+                game.occupy(x,y,self.marker,Player.MOVE_FIRST)
                 self.occupations.append( game.square(x,y) )
                 self.strategize(game,opponent,x,y)
             elif self.paths or opponent.paths:
@@ -313,13 +601,16 @@ class Player:
                 if self.paths and self.paths[0].rank() == 1:
                     next_move = self.paths[0][0]
                     winning_move = True
+                    branch = Player.MOVE_WIN
                 elif opponent.paths and opponent.paths[0].rank() == 1:
                     next_move = opponent.paths[0][0]
                     winning_move = self.check_winning_move(next_move)
+                    branch = Player.MOVE_BLOCK
                 elif ( self.marker == 'O' and game.is_corner(o_first) and game.is_corner(o_last) and 
                         len(self.occupations) == 1 ):
                     x,y = game.available_edge()
                     next_move = game.square(x,y)
+                    branch = Player.MOVE_EDGE
                 elif self.paths and opponent.paths:
                     '''
                     If both the computer and human player have win-paths that are defined, apply some
@@ -330,28 +621,13 @@ class Player:
                     ourselves with intersections between opposing paths. If two paths intersect, we increase
                     the "weight" of the intersection by a value inversely proportional to the minimum rank
                     of the two intersecting paths. This ensures that intersections in "better" paths will
-                    ultimately result in a win or a block.
+                    ultimately result in a win or a block. The weights of every pair of paths are found at
+                    once by the game, see Game.best_intersection().
                     '''
-                    weights = {}
-                    for my_path in self.paths:
-                        for opp_path in opponent.paths:
-                            # Get the intersection point
-                            x,y = my_path.intersection(opp_path)
-                            if x != None and y != None and not game.is_played(x,y):
-                                # Only evaluate "legal" moves, i.e. non-occupied squares
-                                key = game.coordinate_key(x,y)
-                                if not weights.has_key(key):
-                                    weights[key] = 0.0
-                                weights[key] += 1.0 / min(my_path.rank(),opp_path.rank())
-
-                    if len(weights.values()) > 0:
-                        # If intersection points were found, locate one with a maximum weight
-                        # It's OK to break after we find one, we have already guaranteed that these are ALL legal moves
-                        max_weight = max(weights.values())
-                        for key,weight in weights.items():
-                            if weight == max_weight:
-                                next_move = game.square(key)
-                                break
+                    x,y = game.best_intersection(self,opponent)
+                    if x != None and y != None:
+                        next_move = game.square(x,y)
+                        branch = Player.MOVE_INTERSECTION
 
                     if next_move == None:
                         # If no move was found, use a backup of one of the computer's win-path moves
@@ -364,6 +640,7 @@ class Player:
                              (next_path.direction in [Path.VERTICAL,Path.DIAGONAL] and last_move.x > half) ):
                              preferred_choice = 0
                         next_move = next_path[preferred_choice]
+                        branch = Player.MOVE_BACKUP
                     winning_move = self.check_winning_move(next_move)
                 else:
                     # If all else fails, choose either a move along our next win-path or choose one to block the opponent
@@ -377,9 +654,10 @@ class Player:
                          (next_path.direction in [Path.VERTICAL,Path.DIAGONAL] and last_move.x > half) ):
                          preferred_choice = 0
                     next_move = next_path[preferred_choice]
+                    branch = Player.MOVE_PATH
 
                 if next_move:
-                    game.occupy(next_move.x,next_move.y,self.marker)
+                    game.occupy(next_move.x,next_move.y,self.marker,branch)
                     self.occupations.append( next_move )
                     self.strategize(game,opponent,next_move.x,next_move.y)
 
@@ -393,18 +671,43 @@ class Player:
                 game.complete(Game.STATE_DRAW)
         else:
             # A User Move
-            game.occupy(x,y,self.marker)
-            self.occupations.append( game.square(x,y) )
-
-            if self.check_winning_move(game.square(x,y)):
-                game.complete(Game.STATE_COMPLETE,self.marker)
-            elif not game.squares_available():
-                # No more moves available, game is a draw
-                game.complete(Game.STATE_DRAW)
-            else:
-                self.strategize(game,opponent,x,y)
+            self.place(game,opponent,x,y)
+            if game.state == Game.STATE_IN_PROGRESS:
                 opponent.move(game,self)
 
+    def place(self,game,opponent,x,y):
+        '''
+        Places this player's marker at x,y and completes the game if that wins it or fills the
+        board. Unlike a user move, the opponent does not respond.
+        '''
+        game.occupy(x,y,self.marker)
+        self.occupations.append( game.square(x,y) )
+
+        if self.check_winning_move(game.square(x,y)):
+            game.complete(Game.STATE_COMPLETE,self.marker)
+        elif not game.squares_available():
+            # No more moves available, game is a draw
+            game.complete(Game.STATE_DRAW)
+        else:
+            self.strategize(game,opponent,x,y)
+
+    def solved_move(self,game,opponent):
+        '''
+        Performs the perfect move looked up in the game's solution. Win paths are still
+        maintained so that wins by either player are detected the same way as usual.
+        '''
+        x,y = game.solution.best_move(game)
+        winning_move = self.check_winning_move(game.square(x,y))
+
+        game.occupy(x,y,self.marker,Player.MOVE_SOLVED)
+        self.occupations.append( game.square(x,y) )
+        self.strategize(game,opponent,x,y)
+
+        if winning_move:
+            game.complete(Game.STATE_COMPLETE,self.marker)
+        elif not game.squares_available():
+            game.complete(Game.STATE_DRAW)
+
     def sort_paths(self):
         '''Ranks and orders win paths by the number of moves until completion'''
         self.paths.sort(key=lambda path: path.rank())
@@ -466,14 +769,324 @@ class Player:
 
         for direction,path in members.items():
             if path and direction not in ignore:
-                self.paths.append( Path(path,direction) )
+                self.paths.append( Path(path,direction,game) )
+
+        self.sort_paths()
+
+
+class SparseGame(Game):
+    '''
+    A Game for very large boards that only stores the squares that have been played. Squares
+    are kept in a dictionary keyed by their x,y coordinate, and each row, column and diagonal
+    has an index of the squares played along it that is created the first time the line is
+    touched. Memory and the cost of a move depend on the number of moves played rather than
+    on the area of the board.
+    '''
+    # Boards at least this big are played as a SparseGame by the interactive game
+    MIN_SIZE = 100
+
+    # Line paths have no square ids to weigh, and the matrix would be as big as the board
+    NUMPY_WEIGHTS = False
+
+    # The number of rows and columns shown by print_board()
+    PRINT_WINDOW = 15
+
+    def __init__(self,size,solution=None,rng=None):
+        self.occupied = {}
+        self.lines = {}
+        self.state = Game.STATE_IN_PROGRESS
+        self.size = size
+        self.winner = None
+        self.squares_played = 0
+        self.solution = solution
+        self.grid = None
+        self.rng = rng or random
+        self.recorder = None
+        self.last_played = None
+
+        # Setup players. By default, computer is first and is X
+        self.computer = SparsePlayer('X',self)
+        self.player = SparsePlayer('O',self)
+
+    def square(self,x,y=None):
+        '''
+        Returns the square at x,y or if y is not provided, treat x as a key. Squares that have
+        not been played are not stored, so a new unmarked Square is returned for them.
+        '''
+        if y == None:
+            x,y = divmod(x,self.size)
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            raise IndexError('(%s,%s) is not on the board' % (x,y))
+        return self.occupied.get( (x,y) ) or Square(x,y)
+
+    def occupy(self, x, y, marker, branch = 0):
+        '''Marks a square at an x,y coordinate and records it in the index of each line through it'''
+        square = self.square(x,y)
+        square.mark(marker)
+        self.occupied[ (x,y) ] = square
+        for line in self.lines_through(x,y):
+            self.lines.setdefault(line,[]).append(square)
+        self.last_played = (x,y)
+        self.squares_played += 1
+        if self.recorder is not None:
+            self.recorder.record(self.coordinate_key(x,y),marker,branch)
+
+    def is_played(self, x, y):
+        return (x,y) in self.occupied
+
+    def is_corner(self, square):
+        '''The same as Game.is_corner(), from the coordinates as the tables would cover the whole board'''
+        x,y = square.x, square.y
+        return x in [0,self.size - 1] and y in [0,self.size - 1]
+
+    def is_edge(self, square):
+        '''The same as Game.is_edge(), from the coordinates'''
+        x,y = square.x, square.y
+        return ((x in [0,self.size-1] and 0 < y < self.size-1) or 
+                (y in [0,self.size-1] and 0 < x < self.size-1))
+
+    def copy(self):
+        '''The same as Game.copy(), copying the played squares and the line index instead of a board'''
+        game = self.__class__(self.size)
+        game.solution = self.solution
+        game.rng = self.rng
+        game.state = self.state
+        game.winner = self.winner
+        game.squares_played = self.squares_played
+        game.last_played = self.last_played
+
+        for (x,y),square in self.occupied.items():
+            game.occupied[ (x,y) ] = Square(x,y)
+            game.occupied[ (x,y) ].placemark = square.placemark
+        for line,squares in self.lines.items():
+            game.lines[line] = [ game.occupied[ (s.x,s.y) ] for s in squares ]
+
+        for source,target in [(self.computer,game.computer),(self.player,game.player)]:
+            target.marker = source.marker
+            target.occupations = SparseOccupations(source.occupations,game)
+            target.paths = [ path.copy(game) for path in source.paths ]
+        return game
+
+    def lines_through(self, x, y):
+        '''The (direction,index) of each line through x,y'''
+        lines = [ (Path.HORIZONTAL,x), (Path.VERTICAL,y) ]
+        if x == y:
+            lines.append( (Path.DIAGONAL,0) )
+        if y == self.size - x - 1:
+            lines.append( (Path.DIAGONAL_INVERSE,0) )
+        return lines
+
+    def line(self, direction, index):
+        '''The squares that have been played along a line'''
+        return self.lines.get( (direction,index), [] )
+
+    def __random_point(self, low, high):
+        '''
+        Picks a random unplayed point (x,y) with low <= x,y < high or (None,None). Points are
+        sampled until an unplayed one is found, which takes few tries on a sparsely played
+        board. If the area is mostly played we fall back to checking every point.
+        '''
+        area = pow(high - low,2)
+        if area <= 0:
+            return (None,None)
+        if self.squares_played < area / 2:
+            while True:
+                x,y = self.rng.randrange(low,high),self.rng.randrange(low,high)
+                if not self.is_played(x,y):
+                    return (x,y)
+
+        coords = [(x,y) for x in range(low,high) for y in range(low,high) if not self.is_played(x,y)]
+        self.rng.shuffle(coords)
+        return coords[0] if coords else (None,None)
+
+    def available_square(self):
+        return self.__random_point(0,self.size)
+
+    def available_center(self):
+        return self.__random_point(1,self.size-1)
+
+    def available_edge(self):
+        '''Picks the first unplayed edge in the same order as Game.available_edge()'''
+        last = self.size - 1
+        edges = [ (0,y) for y in xrange(1,last) ]
+        for x in xrange(1,last):
+            edges.append( (x,0) )
+            edges.append( (x,last) )
+        edges.extend( [ (last,y) for y in xrange(1,last) ] )
+
+        for x,y in edges:
+            if not self.is_played(x,y):
+                return (x,y)
+        return (None,None)
+
+    def print_board(self):
+        '''
+        Prints the PRINT_WINDOW x PRINT_WINDOW part of the board around the last move, and how many
+        of the squares that have been played are outside it. Only the window and the played squares
+        are looked at, so printing costs the same however big the board is.
+        '''
+        window = min(SparseGame.PRINT_WINDOW,self.size)
+        x,y = self.last_played or (0,0)
+        top = min(max(x - window / 2,0),self.size - window)
+        left = min(max(y - window / 2,0),self.size - window)
+        rows,columns = range(top,top + window),range(left,left + window)
+
+        label = len(str(rows[-1]))
+        width = len(str(columns[-1]))
+        glue = '\n' + ' ' * (label + 2) + ('+'.join([ '-' * (width + 2) for y in columns ])) + '\n'
+        header = ' ' * (label + 3) + '   '.join([ str(y).center(width) for y in columns ]) + ' '
+        lines = []
+        for x in rows:
+            cells = [ str(self.occupied.get( (x,y) ,' ')).center(width) for y in columns ]
+            lines.append(' ' + str(x).rjust(label) + '  ' + (' | '.join(cells)) + ' ')
+
+        outside = len([ 1 for x,y in self.occupied if not (top <= x < top + window and left <= y < left + window) ])
+        print '\n' + header + '\n' + glue.join(lines) + '\n'
+        if outside:
+            print '%s more played squares are outside rows %s-%s and columns %s-%s\n' % (
+                outside,rows[0],rows[-1],columns[0],columns[-1])
+
+
+class LinePath(Path):
+    '''
+    A Path along a whole row, column or diagonal of a SparseGame. Instead of a list of squares
+    as long as the board is wide, it keeps the squares its owner has played on the line and
+    walks the line on demand, skipping those squares.
+    '''
+    def __init__(self, game, direction, index, owned):
+        self.game = game
+        self.direction = direction
+        self.index = index
+        self.owned = set(owned)
+
+    def point(self, i):
+        '''The i-th point (x,y) along the line'''
+        if self.direction == Path.HORIZONTAL:
+            return (self.index,i)
+        elif self.direction == Path.VERTICAL:
+            return (i,self.index)
+        elif self.direction == Path.DIAGONAL:
+            return (i,i)
+        else:
+            return (i,self.game.size - i - 1)
+
+    def on_line(self, x, y):
+        if self.direction == Path.HORIZONTAL:
+            return x == self.index
+        elif self.direction == Path.VERTICAL:
+            return y == self.index
+        elif self.direction == Path.DIAGONAL:
+            return x == y
+        else:
+            return y == self.game.size - x - 1
+
+    def copy(self, game=None):
+        '''A copy of this path, on game if one is given'''
+        return LinePath(game or self.game,self.direction,self.index,self.owned)
+
+    def rank(self):
+        return self.game.size - len(self.owned)
+
+    def __contains__(self, item):
+        return self.on_line(item.x,item.y) and (item.x,item.y) not in self.owned
+
+    def __iter__(self):
+        for i in xrange(self.game.size):
+            point = self.point(i)
+            if point not in self.owned:
+                yield self.game.square(*point)
+
+    def __getitem__(self, key):
+        '''Walks the line from the start, or from the end for negative keys, skipping owned squares'''
+        step = 1 if key >= 0 else -1
+        count = key if key >= 0 else -key - 1
+        i = 0 if key >= 0 else self.game.size - 1
+        while 0 <= i < self.game.size:
+            point = self.point(i)
+            if point not in self.owned:
+                if count == 0:
+                    return self.game.square(*point)
+                count -= 1
+            i += step
+        raise IndexError(key)
+
+    def remove(self, square):
+        self.owned.add( (square.x,square.y) )
+
+    def __repr__(self):
+        return 'LinePath(%s): %s %s' % (self.rank(),self.direction,self.index)
+
+
+class SparseOccupations(Occupations):
+    '''
+    Occupations of a SparseGame, indexed by a set, as a bitset index would grow with the distance
+    of the squares played from (0,0) rather than with their number
+    '''
+    __slots__ = []
+
+    def __init__(self, squares=[], game=None):
+        self.ids = array('l')
+        self.index = set()
+        self.game = game
+        for square in squares:
+            self.append(square)
+
+    def append(self, square):
+        id = square_id(square.x,square.y)
+        self.ids.append(id)
+        self.index.add(id)
+
+    def __contains__(self, square):
+        return square_id(square.x,square.y) in self.index
+
+
+class SparsePlayer(Player):
+    '''A Player of a SparseGame, whose win paths are built from the game's line index'''
+    __slots__ = []
+
+    def __init__(self,marker,game=None):
+        Player.__init__(self,marker)
+        self.occupations = SparseOccupations(game=game)
+
+    def strategize(self, game, opponent, x, y):
+        '''
+        The same as Player.strategize(), except that each line through x,y is checked using the
+        squares played along it rather than by scanning every square of the line
+        '''
+        opponent.destrategize(game,x,y)
+        ignore = [] # Array of ignoring path directions
+
+        # Mark any existing path containing this point to be ignored to prevent double paths
+        square = game.square(x,y)
+        for path in self.paths:
+            if path.direction not in ignore and square in path:
+                path.remove(square)
+                ignore.append(path.direction)
+
+        for direction,index in game.lines_through(x,y):
+            if direction in ignore:
+                continue
+            played = game.line(direction,index)
+            if len(played) < game.size and not [ s for s in played if s.placemark != self.marker ]:
+                self.paths.append( LinePath(game,direction,index,[ (s.x,s.y) for s in played ]) )
 
         self.sort_paths()
 
 
 if __name__ == '__main__':
+    import os
+    import render
+    import solver
+    import sys
+
+    def wrote(lines=1):
+        '''Tells the renderer, if the board is drawn with one, about lines written below the board'''
+        if renderer is not None:
+            renderer.wrote(lines)
+
     def input_coordinate(row_col, max_val):
         coord = raw_input(">>> Enter a %s number (0-%s): " % (row_col, max_val))
+        wrote()
         while type(coord) == str:
             try:
                 coord = int(coord)
@@ -482,6 +1095,7 @@ if __name__ == '__main__':
             except ValueError:
                 print "I'm sorry, %s is not a valid input" % coord
                 coord = raw_input(">>> Enter a %s number (0-%s): " % (row_col, max_val))
+                wrote(2)
         return coord
 
     try:
@@ -499,7 +1113,17 @@ if __name__ == '__main__':
                     size = None
 
             print "Setting up a %sx%s playing board" % (size,size)
-            game = Game(size)
+            if size >= SparseGame.MIN_SIZE:
+                game = SparseGame(size)
+            else:
+                solution = None
+                if os.path.exists('%sx%s.solution' % (size,size)):
+                    # Play perfectly using a solution file written by solver.py
+                    try:
+                        solution = solver.load('%sx%s.solution' % (size,size))
+                    except (ValueError,EnvironmentError), e:
+                        print 'Ignoring the solution file, the computer will use its heuristics: %s' % e
+                game = Game(size,solution)
 
             first = None
             while first is None:
@@ -509,21 +1133,30 @@ if __name__ == '__main__':
                      first = None
             first = first.upper().strip() == '2' # Should the computer go first?
 
+            # Large boards on a terminal are redrawn by only updating the squares that changed
+            renderer = None
+            if ( sys.stdout.isatty() and not isinstance(game,SparseGame) and
+                 size >= render.BoardRenderer.MIN_SIZE ):
+                renderer = render.BoardRenderer()
+            show_board = renderer.draw if renderer else lambda game: game.print_board()
+
             game.play(first)
             while game.state == Game.STATE_IN_PROGRESS:
-                game.print_board()
+                show_board(game)
                 if game.computer.occupations:
                     print "Last computer move at %s" % game.computer.occupations[-1].__repr__()
+                    wrote()
 
                 move = []
                 while not move:
                     move = [ input_coordinate('row',game.size-1), input_coordinate('column',game.size-1) ]
                     if game.is_played(move[0],move[1]):
                         print "The position (%s,%s) is unavailable" % tuple(move)
+                        wrote()
                         move = []
                     else:
                         game.player.move(game,game.computer,move[0],move[1])
-            game.print_board()
+            show_board(game)
             if game.state == Game.STATE_DRAW:
                 print 'The game is a draw!'
             else:
@@ -0,0 +1,278 @@
+#!/usr/bin/python -tt
+'''
+A round-robin tournament between move engines. Every pair of engines plays a number of games
+on each board size, alternating which engine moves first, and the games are spread over a pool
+of worker processes. Results are tallied as they stream in from the workers into win, draw and
+loss tables, Elo estimates and per-move latency percentiles for each engine.
+
+Each game gets its own random.Random seeded from the tournament seed and the game's index in
+the schedule, so every game (and so the tables, ratings and results digest) can be reproduced
+exactly from the seed no matter how many processes play them or in which order they finish.
+Only the latencies are measured on the wall clock and vary from run to run.
+'''
+import hashlib
+import os
+import random
+import solver
+import sys
+import traceback
+from itertools import combinations, imap
+from multiprocessing import Pool
+from optparse import OptionParser
+from timeit import default_timer
+from tictactoe import Game
+
+# Outcomes of a game from the point of view of the engine moving first
+WIN = 'W'
+DRAW = 'D'
+LOSS = 'L'
+
+# Elo ratings are centered on this, and every engine is credited with one draw against it
+BASE_RATING = 1500.0
+RATING_PASSES = 200
+
+PERCENTILES = [50,90,99]
+
+class NoMove(Exception):
+    '''Raised by an engine that has no move to make in a game that is still in progress'''
+
+def heuristic_move(game,player,opponent):
+    '''The computer's own move, see Player.move()'''
+    player.move(game,opponent)
+
+def random_move(game,player,opponent):
+    '''A move on any available square'''
+    x,y = game.available_square()
+    if x is None:
+        raise NoMove('no square is available')
+    player.place(game,opponent,x,y)
+
+_solutions = {}
+
+def solved_move(game,player,opponent):
+    '''A perfect move looked up in SIZExSIZE.solution in the current directory, see solver.py'''
+    solution = _solutions.get(game.size)
+    if solution is None:
+        solution = _solutions[game.size] = solver.load('%sx%s.solution' % (game.size,game.size))
+    x,y = solution.best_move(game)
+    player.place(game,opponent,x,y)
+
+# An engine makes one move for player, given a game in progress
+ENGINES = {
+    'heuristic': heuristic_move,
+    'random': random_move,
+    'solved': solved_move,
+}
+
+def match_seed(seed,index):
+    '''The seed of the index-th game of a tournament'''
+    return seed * 1000003 + index
+
+def schedule(sizes,engines,games):
+    '''
+    The tasks (index,size,first,second) of a tournament, where first moves first. Each pair of
+    engines plays games games per size, taking turns to move first.
+    '''
+    tasks = []
+    for size in sizes:
+        for a,b in combinations(engines,2):
+            for i in range(games):
+                first,second = (a,b) if i % 2 == 0 else (b,a)
+                tasks.append( (len(tasks),size,first,second) )
+    return tasks
+
+def play_match(task):
+    '''
+    Plays one scheduled game. Returns (index,size,first,second,outcome,moves,latencies) where
+    outcome is from the point of view of first, moves is the board keys played in order and
+    latencies are the seconds taken by each engine's moves. An engine that raises NoMove, or
+    returns without moving or ending the game, forfeits it. Any other exception is a bug in the
+    engine and is raised again as a RuntimeError carrying the original traceback, which would
+    otherwise be lost on the way back from a worker process.
+    '''
+    seed,index,size,first,second = task
+    game = Game(size,rng=random.Random(match_seed(seed,index)))
+    players = [game.computer,game.player]
+    names = [first,second]
+    latencies = ([],[])
+
+    turn = 0
+    forfeit = None
+    while game.state == Game.STATE_IN_PROGRESS:
+        if not game.squares_available():
+            game.complete(Game.STATE_DRAW)
+            break
+
+        side = turn % 2
+        played = game.squares_played
+        start = default_timer()
+        try:
+            ENGINES[names[side]](game,players[side],players[1 - side])
+        except NoMove:
+            forfeit = side
+        except Exception:
+            raise RuntimeError("The %s engine failed in game %s on %sx%s:\n%s" % (
+                names[side],index,size,size,traceback.format_exc()))
+        latencies[side].append( default_timer() - start )
+
+        if forfeit is None and game.state == Game.STATE_IN_PROGRESS and game.squares_played == played:
+            # The engine neither moved nor ended the game
+            forfeit = side
+        if forfeit is not None:
+            break
+        turn += 1
+
+    if forfeit is not None:
+        outcome = LOSS if forfeit == 0 else WIN
+    elif game.state == Game.STATE_COMPLETE:
+        outcome = WIN if game.winner == players[0].marker else LOSS
+    else:
+        outcome = DRAW
+
+    moves = tuple([ game.coordinate_key(x,y) for marker,x,y in game.history() ])
+    return (index,size,first,second,outcome,moves,latencies)
+
+def percentile(values,p):
+    '''The nearest-rank p-th percentile of sorted values'''
+    if not values:
+        return None
+    rank = max(int(-(-p * len(values) // 100)),1)
+    return values[rank - 1]
+
+def elo(engines,games):
+    '''
+    Estimates ratings from (first,second,score) games, where score is 1, 0.5 or 0 for first.
+    The ratings are fitted to all the games at once, so they don't depend on the order the
+    games were played in, and the virtual draw against BASE_RATING keeps an engine that won
+    or lost every game from running off to infinity.
+    '''
+    ratings = dict([ (engine,BASE_RATING) for engine in engines ])
+    counts = dict([ (engine,1) for engine in engines ])
+    for first,second,score in games:
+        counts[first] += 1
+        counts[second] += 1
+
+    expected = lambda rating,other: 1.0 / (1.0 + 10.0 ** ((other - rating) / 400.0))
+    for i in range(RATING_PASSES):
+        errors = dict([ (engine,0.5 - expected(ratings[engine],BASE_RATING)) for engine in engines ])
+        for first,second,score in games:
+            error = score - expected(ratings[first],ratings[second])
+            errors[first] += error
+            errors[second] -= error
+        for engine in engines:
+            ratings[engine] += 400.0 * errors[engine] / counts[engine]
+    return ratings
+
+
+class Standings:
+    '''The results of a tournament, tallied one game at a time in any order'''
+    def __init__(self,sizes,engines):
+        self.sizes = sizes
+        self.engines = engines
+        self.tables = dict([ ((size,engine),{WIN:0,DRAW:0,LOSS:0}) for size in sizes for engine in engines ])
+        self.latencies = dict([ ((size,engine),[]) for size in sizes for engine in engines ])
+        self.results = {}
+
+    def add(self,result):
+        index,size,first,second,outcome,moves,latencies = result
+        self.tables[(size,first)][outcome] += 1
+        self.tables[(size,second)][{WIN:LOSS,DRAW:DRAW,LOSS:WIN}[outcome]] += 1
+        self.latencies[(size,first)].extend(latencies[0])
+        self.latencies[(size,second)].extend(latencies[1])
+        self.results[index] = (size,first,second,outcome,moves)
+
+    def ratings(self,size):
+        games = [ (first,second,{WIN:1.0,DRAW:0.5,LOSS:0.0}[outcome])
+                  for index,(s,first,second,outcome,moves) in sorted(self.results.items()) if s == size ]
+        return elo(self.engines,games)
+
+    def digest(self):
+        '''A hash of every game played, which only matches between runs if every move does'''
+        digest = hashlib.sha1()
+        for index,result in sorted(self.results.items()):
+            digest.update( '%s %s %s %s %s %s\n' % ((index,) + result) )
+        return digest.hexdigest()
+
+    def report(self,out=sys.stdout):
+        width = max([ len(engine) for engine in self.engines ] + [6])
+        for size in self.sizes:
+            ratings = self.ratings(size)
+            out.write('\n%sx%s\n' % (size,size))
+            out.write('%s %6s %6s %6s %7s   %s\n' % ('engine'.ljust(width),'W','D','L','Elo',
+                      '  '.join([ ('p%s us' % p).rjust(9) for p in PERCENTILES ])))
+            for engine in sorted(self.engines,key=lambda engine: -ratings[engine]):
+                table = self.tables[(size,engine)]
+                latencies = sorted(self.latencies[(size,engine)])
+                cells = []
+                for p in PERCENTILES:
+                    value = percentile(latencies,p)
+                    cells.append( ('%.0f' % (value * 1e6) if value is not None else '-').rjust(9) )
+                out.write('%s %6s %6s %6s %7.0f   %s\n' % (engine.ljust(width),table[WIN],table[DRAW],
+                          table[LOSS],ratings[engine],'  '.join(cells)))
+        out.write('\nResults digest: %s\n' % self.digest())
+
+
+def run(sizes,engines,games,seed,processes=None):
+    '''Plays a tournament and returns its Standings'''
+    standings = Standings(sizes,engines)
+    tasks = [ (seed,) + task for task in schedule(sizes,engines,games) ]
+
+    if processes == 1:
+        for result in imap(play_match,tasks):
+            standings.add(result)
+    else:
+        pool = Pool(processes)
+        try:
+            for result in pool.imap_unordered(play_match,tasks,chunksize=16):
+                standings.add(result)
+        finally:
+            pool.close()
+            pool.join()
+    return standings
+
+def parse_sizes(text):
+    '''Parses a comma separated list of board sizes and MIN-MAX ranges'''
+    sizes = []
+    for part in text.split(','):
+        low,sep,high = part.partition('-')
+        sizes.extend( range(int(low),int(high or low) + 1) )
+    return sizes
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('-s', '--sizes', default='3',
+                      help='board sizes to play, e.g. 3,5 or 3-6 (default: 3)')
+    parser.add_option('-e', '--engines', default='heuristic,random',
+                      help='comma separated engines from %s (default: heuristic,random)' % ', '.join(sorted(ENGINES)))
+    parser.add_option('-n', '--games', type='int', default=100,
+                      help='games per pair of engines and board size (default: 100)')
+    parser.add_option('-r', '--seed', type='int', default=0,
+                      help='tournament seed (default: 0)')
+    parser.add_option('-p', '--processes', type='int', default=None,
+                      help='number of worker processes (default: one per CPU)')
+    options,args = parser.parse_args()
+    if args:
+        parser.error('unexpected arguments')
+
+    try:
+        sizes = parse_sizes(options.sizes)
+    except ValueError:
+        parser.error("invalid board sizes '%s'" % options.sizes)
+    engines = []
+    for engine in options.engines.split(','):
+        if engine not in engines:
+            engines.append(engine)
+    for engine in engines:
+        if engine not in ENGINES:
+            parser.error("unknown engine '%s'" % engine)
+    if len(engines) < 2:
+        parser.error('at least two different engines are required')
+    if 'solved' in engines:
+        for size in sizes:
+            if not os.path.exists('%sx%s.solution' % (size,size)):
+                parser.error('the solved engine needs %sx%s.solution, see solver.py' % (size,size))
+
+    print 'Playing %s games of %s on %s' % (options.games,' vs '.join(engines),
+          ', '.join([ '%sx%s' % (size,size) for size in sizes ]))
+    run(sizes,engines,options.games,options.seed,options.processes).report()
@@ -0,0 +1,185 @@
+#!/usr/bin/python -tt
+'''
+Exhaustive verification that the computer never loses. Rather than sampling random
+opponents, every possible sequence of opponent moves is played against the computer. The
+only non-deterministic parts of the computer player are the random picks made by
+available_corner() and available_center(), so every one of their possible outcomes is
+explored as a separate branch. Positions are memoized on the complete engine state, which
+keeps a 3x3 board down to a few seconds and makes a 4x4 board tractable.
+'''
+import sys
+from multiprocessing import Pool
+from optparse import OptionParser
+from tictactoe import Game
+
+class BranchingGame(Game):
+    '''
+    A Game whose random point choices are driven by a script rather than by shuffle(). Each
+    time the computer asks for a random corner or center, the next entry in the script is
+    used as an index into the list of available points (0 when the script is exhausted) and
+    the number of points that could have been chosen is recorded in choices.
+    '''
+    def __init__(self,size):
+        Game.__init__(self,size)
+        self.script = []
+        self.choices = []
+
+    def __choose_point(self,digit_range):
+        '''Chooses the scripted point (x,y) among the available points or (None,None)'''
+        coords = [(x,y) for x in digit_range for y in digit_range if not self.is_played(x,y)]
+        if not coords:
+            return (None,None)
+
+        depth = len(self.choices)
+        pick = self.script[depth] if depth < len(self.script) else 0
+        self.choices.append(len(coords))
+        return coords[pick]
+
+    def available_corner(self):
+        return self.__choose_point([0,self.size-1])
+
+    def available_center(self):
+        return self.__choose_point(range(1,self.size-1))
+
+
+def outcomes(game,action):
+    '''
+    Applies action to copies of game, once for every way the computer's random choices can
+    be resolved, and yields each resulting game
+    '''
+    pending = [[]]
+    while pending:
+        script = pending.pop()
+        branch = game.copy()
+        branch.script = script
+        action(branch)
+
+        # Every choice point past the end of the script was resolved with a 0, so queue up
+        # the alternatives for each of them
+        taken = script + [0] * (len(branch.choices) - len(script))
+        for depth in range(len(script),len(branch.choices)):
+            for pick in range(1,branch.choices[depth]):
+                pending.append(taken[:depth] + [pick])
+        yield branch
+
+def position_key(game):
+    '''
+    The canonical form of a position as far as the computer is concerned. The computer's
+    decisions depend on the board, both players' win paths (including their order) and the
+    last moves of each player, so all of those are part of the key. Board symmetries are
+    deliberately not folded together as the computer breaks ties by orientation.
+    '''
+    def paths(player):
+        return tuple([ (path.direction,tuple(path.ids)) for path in player.paths ])
+
+    def last(player,count):
+        return tuple([ game.coordinate_key(s.x,s.y) for s in player.occupations[-count:] ])
+
+    board = ''.join([ square.placemark or '.' for square in game.board ])
+    return ( board, game.computer.marker, paths(game.computer), paths(game.player),
+             last(game.computer,1), last(game.player,2) )
+
+def search(game,memo):
+    '''
+    Searches every line of play from game onward. Returns the shortest list of moves that
+    ends with the computer losing, or None if the computer never loses from here.
+    '''
+    if game.state != Game.STATE_IN_PROGRESS:
+        if game.state == Game.STATE_COMPLETE and game.winner == game.player.marker:
+            return []
+        return None
+
+    key = position_key(game)
+    if key in memo:
+        return memo[key]
+
+    shortest = None
+    for square in game.board:
+        if square.marked():
+            continue
+
+        x,y = square.x,square.y
+        for branch in outcomes(game,lambda g: g.player.move(g,g.computer,x,y)):
+            line = search(branch,memo)
+            if line is not None:
+                line = branch.history()[game.squares_played:] + line
+                if shortest is None or len(line) < len(shortest):
+                    shortest = line
+
+    memo[key] = shortest
+    return shortest
+
+def openings(size,computer_first):
+    '''All of the positions the opponent may face before making their first move'''
+    game = BranchingGame(size)
+    if computer_first:
+        return list(outcomes(game,lambda g: g.play(True)))
+    game.play(False)
+    return [game]
+
+_memo = {}
+
+def verify_opening(task):
+    '''
+    Searches all lines starting with the opponent's first move at x,y. This is the unit of
+    work handed to each worker process, which keeps its memo between tasks.
+    '''
+    size,computer_first,x,y = task
+    shortest = None
+    for game in openings(size,computer_first):
+        if game.is_played(x,y):
+            continue
+        for branch in outcomes(game,lambda g: g.player.move(g,g.computer,x,y)):
+            line = search(branch,_memo)
+            if line is not None:
+                line = branch.history() + line
+                if shortest is None or len(line) < len(shortest):
+                    shortest = line
+    return shortest
+
+def verify(size,processes=1):
+    '''
+    Verifies that the computer never loses on a board of the given size, moving first or
+    second. Returns None if it never loses, otherwise the shortest losing line found as a
+    list of (marker,x,y) moves.
+    '''
+    tasks = [ (size,computer_first,x,y) for computer_first in [True,False]
+              for x in range(size) for y in range(size) ]
+
+    if processes == 1:
+        results = map(verify_opening,tasks)
+    else:
+        pool = Pool(processes)
+        try:
+            results = pool.map(verify_opening,tasks,chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    shortest = None
+    for line in results:
+        if line is not None and (shortest is None or len(line) < len(shortest)):
+            shortest = line
+    return shortest
+
+def format_line(line):
+    return ' '.join([ '%s(%s,%s)' % move for move in line ])
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] SIZE [SIZE ...]')
+    parser.add_option('-p', '--processes', type='int', default=None,
+                      help='number of worker processes (default: one per CPU)')
+    options,args = parser.parse_args()
+    if not args:
+        parser.error('at least one board size is required')
+
+    failed = False
+    for size in [ int(arg) for arg in args ]:
+        line = verify(size,options.processes)
+        if line is None:
+            print '%sx%s: the computer never loses' % (size,size)
+        else:
+            failed = True
+            print '%sx%s: the computer can lose: %s' % (size,size,format_line(line))
+    sys.exit(1 if failed else 0)